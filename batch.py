@@ -0,0 +1,262 @@
+# This file runs many rounds of the same match at once, stacking their cores into NumPy arrays and stepping them all in lockstep
+# Every round gives exactly the same result as running it on the headless engine; NumPy is only needed to use this module
+# Rounds are only run here while each warrior has a single process; a round in which a warrior splits is handed over to the engine
+
+from array import array
+from collections import deque
+from random import randrange
+import numpy as np
+from core import addressing_modes, modifiers, opcodes
+from engine import Match, MatchResult
+from executor import field_pairs, jump_fields
+
+SPL = opcodes.index("SPL")
+
+# Lookup tables indexed by addressing mode: which field an indirect mode reads through, and how it changes that field
+reads_a = np.array([mode in "*{}" for mode in addressing_modes])
+reads_b = np.array([mode in "@<>" for mode in addressing_modes])
+decrements = np.array([mode in "{<" for mode in addressing_modes])
+increments = np.array([mode in "}>" for mode in addressing_modes])
+
+# Fields of the core, in the order of Core's arrays
+field_names = ["opcode", "modifier", "a_mode_1", "address_1", "a_mode_2", "address_2"]
+
+class BatchMatch:
+    def __init__(self, warriors : list, rounds : list, field_size : int = 8000, max_cycles : int = 80000, max_length : int = 100, max_processes : int = 8000, seed : int = None, min_distance : int = 0):
+        self.warriors = warriors
+        self.rounds = rounds
+        self.field_size = field_size
+        self.max_cycles = max_cycles
+        self.max_length = max_length
+        self.max_processes = max_processes
+        if seed is None: seed = randrange(2 ** 32)
+        self.seed = seed
+        self.min_distance = min_distance
+        self.warrior_count = len(warriors)
+
+        # The cores of all rounds are laid end to end in one flat array per field, so tile l of round r is at r * field_size + l
+        # Fields are kept as small as possible, as the gathers from these arrays are what the batch spends its time on
+        # Addresses only need 64 bits when multiplying two of them could overflow 32
+        address_type = np.int32 if field_size ** 2 < 2 ** 31 else np.int64
+        for name in field_names:
+            setattr(self, name, np.zeros(len(rounds) * field_size, dtype=address_type if name.startswith("address") else np.uint8))
+        self.modes = {"A": self.a_mode_1, "B": self.a_mode_2}
+        self.values = {"A": self.address_1, "B": self.address_2}
+
+        # The location of each warrior's only process, and whether it is still alive
+        self.pcs = np.zeros((len(rounds), self.warrior_count), dtype=np.int64)
+        self.alive = np.ones((len(rounds), self.warrior_count), dtype=bool)
+
+        # Every round is set up by the engine, so placements are identical to running the rounds one at a time
+        match = Match(warriors, field_size, max_cycles, max_length, max_processes, seed, rounds[0], min_distance)
+        for i, round_index in enumerate(rounds):
+            if i > 0: match.reset(round_index)
+            for name in field_names:
+                getattr(self, name)[i * field_size:(i + 1) * field_size] = np.asarray(getattr(match.core, name))
+            self.pcs[i] = [queue[0] for queue in match.queues]
+
+        self.cycle = 0
+        self.running = np.ones(len(rounds), dtype=bool)
+        self.results = [None] * len(rounds)
+
+    def run(self):
+        # Runs every round to completion, and returns their results in order
+        while self.running.any():
+            self.step()
+
+        return self.results
+
+    def step(self):
+        # Runs one cycle of every round still running
+        for warrior in range(self.warrior_count):
+            rounds = np.nonzero(self.running & self.alive[:, warrior])[0]
+            if len(rounds) > 0: self.execute(rounds, warrior)
+
+        self.cycle += 1
+
+        # As in the engine, a round ends once a cycle leaves at most one warrior alive, or when the cycle limit is reached
+        alive_counts = self.alive.sum(axis=1)
+        ended = self.running & (alive_counts < self.warrior_count) & (alive_counts <= 1)
+        if self.cycle >= self.max_cycles: ended = self.running
+
+        for index in np.nonzero(ended)[0]:
+            self.results[index] = MatchResult(self.cycle, True, [self.warriors[i].id for i in np.nonzero(self.alive[index])[0]])
+            self.running[index] = False
+
+    def execute(self, rounds, warrior : int):
+        # Executes the given warrior's process in each of the given rounds
+        pc = self.pcs[rounds, warrior]
+        base = rounds * self.field_size
+        opcode = self.opcode[base + pc]
+
+        if self.max_processes > 1:
+            # Splitting changes the amount of processes, which only the engine handles; such rounds are handed over before anything is executed
+            splitting = opcode == SPL
+            if splitting.any():
+                for index in rounds[splitting]:
+                    self.hand_over(index, warrior)
+
+                rounds, pc, base, opcode = rounds[~splitting], pc[~splitting], base[~splitting], opcode[~splitting]
+                if len(rounds) == 0: return
+
+        at = base + pc
+        modifier = self.modifier[at]
+        # Both fields are read before either operand is evaluated, as in the engine
+        value_1 = self.address_1[at]
+        value_2 = self.address_2[at]
+        location_1 = self.resolve(base, pc, value_1, self.a_mode_1[at])
+        location_2 = self.resolve(base, pc, value_2, self.a_mode_2[at])
+
+        # Each opcode and modifier combination is applied to the rounds executing it
+        next_pc = np.empty_like(pc)
+        dies = np.empty(len(rounds), dtype=bool)
+        keys = opcode.astype(np.intp) * len(modifiers) + modifier
+        for key in np.flatnonzero(np.bincount(keys)):
+            selected = keys == key
+            next_pc[selected], dies[selected] = self.apply(
+                opcodes[key // len(modifiers)], modifiers[key % len(modifiers)],
+                pc[selected], base[selected] + location_1[selected], base[selected] + location_2[selected]
+            )
+
+        self.pcs[rounds, warrior] = next_pc
+        self.alive[rounds[dies], warrior] = False
+
+    def resolve(self, base, pc, value, mode):
+        # Vectorised counterpart of executor.get_operand_lines; returns the location of each operand within its core
+        n = self.field_size
+        location = (pc + value) % n
+        result = np.where(mode == 0, pc, location)
+
+        for reads, field in ((reads_a, self.address_1), (reads_b, self.address_2)):
+            selected = reads[mode]
+            if not selected.any(): continue
+
+            pointer, pointer_mode = base[selected] + location[selected], mode[selected]
+            result[selected] = (location[selected] + field[pointer]) % n
+
+            # The pointer is changed after the operand has been evaluated
+            changed = pointer[decrements[pointer_mode]]
+            field[changed] = (field[changed] - 1) % n
+            changed = pointer[increments[pointer_mode]]
+            field[changed] = (field[changed] + 1) % n
+
+        return result
+
+    def apply(self, opcode : str, modifier : str, pc, l1, l2):
+        # Vectorised counterpart of executor.get_opcode_lines; l1 and l2 are flat indices into the fields
+        # Returns each process' next location, and whether it died
+        n = self.field_size
+        advance = (pc + 1) % n
+        dies = np.zeros(len(pc), dtype=bool)
+
+        match opcode:
+            case "DAT":
+                return advance, ~dies
+
+            case "MOV":
+                if modifier == "I":
+                    for name in field_names:
+                        field = getattr(self, name)
+                        field[l2] = field[l1]
+                else:
+                    # Sources are read before any target is written, in case both are the same tile
+                    sources = [(self.modes[source][l1], self.values[source][l1]) for target, source in field_pairs[modifier]]
+                    for (target, source), (mode, value) in zip(field_pairs[modifier], sources):
+                        self.modes[target][l2] = mode
+                        self.values[target][l2] = value
+                return advance, dies
+
+            case "ADD" | "SUB" | "MUL" | "DIV" | "MOD":
+                sources = [self.values[source][l1] for target, source in field_pairs[modifier]]
+                for (target, source), value in zip(field_pairs[modifier], sources):
+                    field = self.values[target]
+                    match opcode:
+                        case "ADD": field[l2] = (field[l2] + value) % n
+                        case "SUB": field[l2] = (field[l2] - value) % n
+                        case "MUL": field[l2] = (field[l2] * value) % n
+                        case _:
+                            # Division by 0 kills the process, though earlier fields have already been written
+                            dies |= value == 0
+                            l, v = l2[~dies], value[~dies]
+                            field[l] = field[l] // v if opcode == "DIV" else field[l] % v
+                return advance, dies
+
+            case "JMP":
+                return l1 % n, dies
+
+            case "JMZ" | "JMN" | "DJN":
+                fields = [self.values[field] for field in jump_fields[modifier]]
+                if opcode == "DJN":
+                    for field in fields:
+                        field[l2] = (field[l2] - 1) % n
+
+                if opcode == "JMZ":
+                    condition = np.logical_and.reduce([field[l2] == 0 for field in fields])
+                else:
+                    condition = np.logical_or.reduce([field[l2] != 0 for field in fields])
+                return np.where(condition, l1 % n, advance), dies
+
+            case "SEQ" | "CMP" | "SNE" | "SLT":
+                if modifier == "I" and opcode != "SLT":
+                    condition = np.logical_and.reduce([getattr(self, name)[l1] == getattr(self, name)[l2] for name in field_names])
+                    if opcode == "SNE": condition = ~condition
+                else:
+                    # SLT.I behaves like SLT.F; only equality requires every field pair to pass
+                    pairs = field_pairs["F" if modifier == "I" else modifier]
+                    comparisons = []
+                    for target, source in pairs:
+                        a, b = self.values[source][l1], self.values[target][l2]
+                        comparisons.append({"SEQ": a == b, "CMP": a == b, "SNE": a != b, "SLT": a < b}[opcode])
+                    reduce = np.logical_and if opcode in ("SEQ", "CMP") else np.logical_or
+                    condition = reduce.reduce(comparisons)
+                return np.where(condition, (pc + 2) % n, advance), dies
+
+            case _:
+                # NOP, the unsupported P-space opcodes, and SPL when only one process is allowed
+                return advance, dies
+
+    def hand_over(self, index : int, warrior : int):
+        # Finishes a round on the engine, resuming the current cycle at the given warrior
+        # Tile colours are not tracked in batches, so the engine's core is only accurate in its instructions
+        match = Match(self.warriors, self.field_size, self.max_cycles, self.max_length, self.max_processes, self.seed, self.rounds[index], self.min_distance)
+        for name in field_names:
+            field = getattr(match.core, name)
+            field[:] = array(field.typecode, getattr(self, name)[index * self.field_size:(index + 1) * self.field_size].tolist())
+
+        alive = [int(i) for i in np.nonzero(self.alive[index])[0]]
+        match.warriors = [match.entrants[i] for i in alive]
+        match.queues = [deque([int(self.pcs[index, i])]) for i in alive]
+        match.cycle = self.cycle
+
+        # The current cycle is always finished, even if a warrior already died earlier in it and decided the round
+        match.step(1, alive.index(warrior))
+        if len(alive) < self.warrior_count and len(alive) <= 1: match.completed = True
+
+        self.results[index] = match.run()
+        self.running[index] = False
+
+def run_rounds(warriors : list, rounds : list, field_size : int = 8000, max_cycles : int = 80000, max_length : int = 100, max_processes : int = 8000, seed : int = None, min_distance : int = 0, batch_size : int = 1024):
+    # Runs the given rounds in batches, and returns their results in order
+    # Batches only pay off with many rounds; the default uses about 100 MB for an 8000 tile core
+    if seed is None: seed = randrange(2 ** 32)
+
+    results = []
+    for start in range(0, len(rounds), batch_size):
+        batch = BatchMatch(warriors, rounds[start:start + batch_size], field_size, max_cycles, max_length, max_processes, seed, min_distance)
+        results += batch.run()
+
+    return results
+
+def check_rounds(warriors : list, rounds : list, field_size : int = 8000, max_cycles : int = 80000, max_length : int = 100, max_processes : int = 8000, seed : int = None, min_distance : int = 0):
+    # Differential check: runs every round both in a batch and on the engine, and returns the rounds whose outcomes differ
+    if seed is None: seed = randrange(2 ** 32)
+
+    batch_results = run_rounds(warriors, rounds, field_size, max_cycles, max_length, max_processes, seed, min_distance)
+
+    mismatches = []
+    for round_index, batch_result in zip(rounds, batch_results):
+        result = Match(warriors, field_size, max_cycles, max_length, max_processes, seed, round_index, min_distance).run()
+        if (result.cycles, result.survivors) != (batch_result.cycles, batch_result.survivors):
+            mismatches.append(round_index)
+
+    return mismatches
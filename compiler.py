@@ -1,6 +1,6 @@
 # This file handles the compilation of raw warrior text data into load files
 import re
-import options as o
+import core
 
 # Labels are stored in the format "name": line
 labels = {}
@@ -28,7 +28,7 @@ def compile_load_file(data, debug):
     global constants, labels, debug_enabled, error_list
 
     if data == []: return
-    new_warrior = o.Warrior("Nameless", None, None, None, [], [])
+    new_warrior = core.Warrior("Nameless", None, None, None, [], [])
     error_list = []
     constants = default_constants.copy()
     labels = {}
@@ -72,7 +72,7 @@ def compile_load_file(data, debug):
             attributes = attributes[:i]
             break
 
-        if attributes[0].upper().split(".")[0] not in o.opcodes:
+        if attributes[0].upper().split(".")[0] not in core.opcodes:
             # Identify psuedo-opcodes and labels
             match attributes[0].upper():
                 case "FOR":
@@ -233,7 +233,7 @@ def compile_load_file(data, debug):
         # End processing early in case of errors
         if len(error_list) > 0: break
 
-        load_line = o.Instruction(None, None, None, None, None, None)
+        load_line = core.Instruction(None, None, None, None, None, None)
 
         debug_print("Reading line: " + str(attributes))
 
@@ -244,7 +244,7 @@ def compile_load_file(data, debug):
         if len(opcode_data) == 2:
             # Modifier is determined later if none is declared
             load_line.modifier = opcode_data[1]
-        if opcode_data[0] not in o.opcodes or (len(opcode_data) > 1 and opcode_data[1] not in o.modifiers) or len(opcode_data) > 2:
+        if opcode_data[0] not in core.opcodes or (len(opcode_data) > 1 and opcode_data[1] not in core.modifiers) or len(opcode_data) > 2:
             # Bad opcode
             debug_print("Compiler error detected. Aborting...")
             error_list.append(f"Bad instruction at '{line.strip()}'\n(invalid opcode)")
@@ -263,7 +263,7 @@ def compile_load_file(data, debug):
         if len(attributes) > 1:
             # Extract the A-field addressing mode
             a_mode = attributes[1][0:1]
-            if not a_mode in o.addressing_modes:
+            if not a_mode in core.addressing_modes:
                 # None is declared; use default
                 load_line.a_mode_1 = "$"
                 debug_print("No A-field addressing mode detected, assuming relative...")
@@ -289,7 +289,7 @@ def compile_load_file(data, debug):
         # Ditto for B-field
         if len(attributes) > 2:
             b_mode = attributes[2][0:1]
-            if not b_mode in o.addressing_modes:
+            if not b_mode in core.addressing_modes:
                 load_line.a_mode_2 = "$"
                 debug_print("No B-field addressing mode detected, assuming relative...")
             else:
@@ -326,7 +326,7 @@ def compile_load_file(data, debug):
             break
 
         new_warrior.load_file.append(load_line)
-        debug_print(f"Line completed. Load file output: " + o.parse_instruction_to_text(load_line))
+        debug_print(f"Line completed. Load file output: " + core.parse_instruction_to_text(load_line))
 
         current_line += 1
 
@@ -337,7 +337,7 @@ def compile_load_file(data, debug):
 
     return new_warrior, error_list
 
-def get_default_modifier(instruction : o.Instruction):
+def get_default_modifier(instruction : core.Instruction):
     # If no modifer is specifed in raw data, it is determined according to these rules
     # These are defined arbitrarily in ICWS 94
     match instruction.opcode:
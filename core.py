@@ -0,0 +1,363 @@
+# This file stores the core (playfield) in a compact struct-of-arrays form
+# Every field of every tile lives in its own typed array, rather than one object per tile
+
+from array import array
+from random import Random
+
+# The below lists are compiled from ICWS 94: https://corewar.co.uk/standards/icws94.htm
+# Instructions are stored in the core as indices into these lists
+addressing_modes = [
+    "#", "$", "*", "@", "{", "<", "}", ">"
+]
+
+modifiers = [
+    "A", "B", "AB", "BA", "F", "X", "I"
+]
+
+opcodes = [
+    "DAT", "MOV", "ADD", "SUB", "MUL", "DIV", "MOD", "JMP", "JMZ", "JMN", "DJN", "SPL", "CMP", "SEQ", "SNE", "SLT", "LDP", "STP", "NOP"
+]
+
+DAT = opcodes.index("DAT")
+
+# Tile colours are stored as the colouring warrior's id + 1 (0 meaning no colour), with this bit set if the tile is crossed
+# Ownership and colours are 16-bit, so melees can have up to CROSS - 1 warriors
+CROSS = 0x8000
+
+# Pristine fields of an empty core of each size, which cores are reset from
+templates = {}
+
+# Fraction of tiles a sparse core may have written before it is converted to the dense form
+sparse_threshold = 0.05
+
+# Random hash keys of every tile for each core size, shared by all hashed cores of that size
+hash_keys = {}
+
+class Instruction:
+    def __init__(self, opcode : str, modifier : str, a_mode_1 : str, address_1, a_mode_2 : str, address_2):
+        self.opcode = opcode
+        self.modifier = modifier
+        self.a_mode_1 = a_mode_1
+        self.address_1 = address_1
+        self.a_mode_2 = a_mode_2
+        self.address_2 = address_2
+
+    # Necessary to allow comparisons between instances by attributes
+    def __eq__(self, other):
+        c1 = self.opcode == other.opcode and self.modifier == other.modifier and self.a_mode_1 == other.a_mode_1
+        c2 = self.address_1 == other.address_1 and self.a_mode_2 == other.a_mode_2 and self.address_2 == other.address_2
+        return c1 and c2
+
+class Warrior:
+    def __init__(self, name : str, id : int, color : str, raw_data : list, load_file : list, asserts : list):
+        self.name = name
+        self.id = id
+        self.color = color
+        self.raw_data = raw_data
+        self.load_file = load_file
+        self.asserts = asserts
+
+def parse_instruction_to_text(instruction : Instruction):
+    return f"{instruction.opcode}.{instruction.modifier} {instruction.a_mode_1}{instruction.address_1}, {instruction.a_mode_2}{instruction.address_2}"
+
+def encode_instruction(instruction : Instruction, size : int):
+    # Converts an Instruction object to its fields as stored in a core of the given size, with negative addresses folded into the core
+    return (
+        opcodes.index(instruction.opcode),
+        modifiers.index(instruction.modifier),
+        addressing_modes.index(instruction.a_mode_1),
+        instruction.address_1 % size,
+        addressing_modes.index(instruction.a_mode_2),
+        instruction.address_2 % size
+    )
+
+def get_template(size : int):
+    # Every tile of an empty core is DAT.F $0, $0; the template is only built once for each core size
+    template = templates.get(size)
+    if template is None:
+        template = templates[size] = {
+            "opcode": array("B", [DAT]) * size,
+            "modifier": array("B", [modifiers.index("F")]) * size,
+            "mode": array("B", [addressing_modes.index("$")]) * size,
+            "address": array("I", [0]) * size,
+            "owner": array("H", [0]) * size,
+            "empty": bytes(size),
+            "handlers": [None] * size
+        }
+
+    return template
+
+class SparseArray(dict):
+    # Stands in for one of a core's arrays in a sparse core; only written tiles are stored, keyed by address
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, location : int):
+        return self.default
+
+    def copy(self):
+        field = SparseArray(self.default)
+        field.update(self)
+        return field
+
+def fill_dense(dense, sparse : SparseArray):
+    # Copies every tile stored in a sparse array into a dense one
+    for location, value in sparse.items():
+        dense[location] = value
+
+    return dense
+
+def get_hash_keys(size : int):
+    # Every tile of a core is given a random 64-bit key, only generated once for each core size
+    keys = hash_keys.get(size)
+    if keys is None:
+        rng = Random(size)
+        keys = hash_keys[size] = [rng.getrandbits(64) for location in range(size)]
+
+    return keys
+
+class SparseHashKeys(dict):
+    # Stands in for the hash keys of a sparse core; keys are generated as tiles are first hashed, so huge cores only pay for the tiles in use
+    def __init__(self):
+        super().__init__()
+        self.rng = Random()
+
+    def __missing__(self, location : int):
+        key = self[location] = self.rng.getrandbits(64)
+        return key
+
+class Core:
+    def __init__(self, size : int, sparse : bool = False, hashed : bool = False, warrior_count : int = CROSS - 1):
+        self.size = size
+        # Colours are only counted for warrior ids below this
+        self.warrior_count = warrior_count
+        # Sparse cores suit huge cores which stay mostly empty, but are slower to access; they are made dense once too many tiles are written
+        self.sparse = sparse
+
+        # Hashed cores keep a running hash of every change to their instructions, so repeated states can be spotted cheaply
+        # The hash is the sum of every tile's key times its weighted fields, relative to when the round started
+        self.hash_keys = None
+        if hashed: self.hash_keys = SparseHashKeys() if sparse else get_hash_keys(size)
+        self.core_hash = 0
+
+        # Every tile starts out as DAT.F $0, $0
+        # Addresses are always kept within 0..size-1, so they fit in unsigned 32-bit arrays
+        if sparse:
+            self.opcode = SparseArray(DAT)
+            self.modifier = SparseArray(modifiers.index("F"))
+            self.a_mode_1 = SparseArray(addressing_modes.index("$"))
+            self.address_1 = SparseArray(0)
+            self.a_mode_2 = SparseArray(addressing_modes.index("$"))
+            self.address_2 = SparseArray(0)
+        else:
+            template = get_template(size)
+            self.opcode = template["opcode"][:]
+            self.modifier = template["modifier"][:]
+            self.a_mode_1 = template["mode"][:]
+            self.address_1 = template["address"][:]
+            self.a_mode_2 = template["mode"][:]
+            self.address_2 = template["address"][:]
+
+        # Ownership is stored as warrior id + 1, with 0 meaning unowned
+        self.owner = SparseArray(0) if sparse else get_template(size)["owner"][:]
+        self.color = SparseArray(0) if sparse else get_template(size)["owner"][:]
+
+        # Live amount of tiles coloured by each warrior, indexed like colours without the cross bit; every tile starts uncoloured
+        self.color_counts = [0] * (warrior_count + 1)
+        self.color_counts[0] = size
+        # Set for every eliminated warrior, indexed like ownership; their tiles are drawn crossed without having to be rewritten
+        self.eliminated = bytearray(warrior_count + 1)
+        self.read_marked = SparseArray(0) if sparse else bytearray(size)
+        self.highlighted = SparseArray(0) if sparse else bytearray(size)
+
+        # Compiled handlers for each tile's instruction; None until first executed, and reset whenever the instruction changes
+        self.handlers = SparseArray(None) if sparse else get_template(size)["handlers"][:]
+        # Recorded cores list every tile their handlers are about to write, so the changes can be recorded; None when nothing is recording
+        self.written = None
+
+        # Tiles whose appearance has changed since the renderer last took them; a new core must be drawn in full
+        self.dirty = set()
+        self.full_redraw = True
+        # Tiles currently read marked or highlighted, so clearing them does not have to scan the whole core
+        self.read_marks = []
+        self.highlights = []
+
+    def __len__(self):
+        return self.size
+
+    def reset(self):
+        # Empties the core in place, so it can be reused for another round; every field of a dense core is bulk copied from the template
+        if self.sparse:
+            for field in (self.opcode, self.modifier, self.a_mode_1, self.address_1, self.a_mode_2, self.address_2, self.handlers, self.owner, self.color, self.read_marked, self.highlighted):
+                field.clear()
+        else:
+            template = get_template(self.size)
+            self.opcode[:] = template["opcode"]
+            self.modifier[:] = template["modifier"]
+            self.a_mode_1[:] = template["mode"]
+            self.address_1[:] = template["address"]
+            self.a_mode_2[:] = template["mode"]
+            self.address_2[:] = template["address"]
+            self.handlers[:] = template["handlers"]
+
+            self.owner[:] = template["owner"]
+            self.color[:] = template["owner"]
+            self.read_marked[:] = template["empty"]
+            self.highlighted[:] = template["empty"]
+
+        self.color_counts = [0] * (self.warrior_count + 1)
+        self.color_counts[0] = self.size
+        self.eliminated = bytearray(self.warrior_count + 1)
+        self.core_hash = 0
+
+        self.dirty = set()
+        self.full_redraw = True
+        self.read_marks = []
+        self.highlights = []
+
+    def clear_handlers(self):
+        # Forgets every compiled handler, so each tile's is looked up again when next executed
+        if self.sparse:
+            self.handlers.clear()
+        else:
+            self.handlers[:] = get_template(self.size)["handlers"]
+
+    def is_too_full(self):
+        # Whether a sparse core has written enough tiles to be better off dense
+        return max(len(self.opcode), len(self.address_1), len(self.address_2), len(self.color)) > self.size * sparse_threshold
+
+    def densify(self):
+        # Converts a sparse core to the dense form in place, keeping the contents of every tile
+        template = get_template(self.size)
+        self.opcode = fill_dense(template["opcode"][:], self.opcode)
+        self.modifier = fill_dense(template["modifier"][:], self.modifier)
+        self.a_mode_1 = fill_dense(template["mode"][:], self.a_mode_1)
+        self.address_1 = fill_dense(template["address"][:], self.address_1)
+        self.a_mode_2 = fill_dense(template["mode"][:], self.a_mode_2)
+        self.address_2 = fill_dense(template["address"][:], self.address_2)
+        self.handlers = fill_dense(template["handlers"][:], self.handlers)
+
+        self.owner = fill_dense(template["owner"][:], self.owner)
+        self.color = fill_dense(template["owner"][:], self.color)
+        self.read_marked = fill_dense(bytearray(self.size), self.read_marked)
+        self.highlighted = fill_dense(bytearray(self.size), self.highlighted)
+
+        self.sparse = False
+
+    def copy(self):
+        # Returns an independent copy of the core; every array is bulk copied
+        core = Core.__new__(Core)
+        core.size = self.size
+        core.warrior_count = self.warrior_count
+        core.written = None
+        core.restore(self)
+        return core
+
+    def restore(self, other):
+        # Replaces the contents of this core with copies of another core's of the same size, which is left untouched
+        self.sparse = other.sparse
+        for name in ("opcode", "modifier", "a_mode_1", "address_1", "a_mode_2", "address_2", "handlers", "owner", "color", "read_marked", "highlighted"):
+            field = getattr(other, name)
+            setattr(self, name, field.copy() if other.sparse else field[:])
+        # Handlers of a recorded core also list what they write, so they can only be kept if both cores are recorded or neither is
+        if (self.written is None) != (other.written is None): self.clear_handlers()
+
+        self.color_counts = other.color_counts[:]
+        self.eliminated = other.eliminated[:]
+        self.hash_keys = other.hash_keys
+        self.core_hash = other.core_hash
+
+        self.dirty = set()
+        self.full_redraw = True
+        self.read_marks = other.read_marks[:]
+        self.highlights = other.highlights[:]
+
+    def get_fields(self):
+        # Every instruction field; compares equal to copy_fields() only while the core holds exactly the same instructions
+        return self.opcode, self.modifier, self.a_mode_1, self.address_1, self.a_mode_2, self.address_2
+
+    def copy_fields(self):
+        return tuple(field.copy() if self.sparse else field[:] for field in self.get_fields())
+
+    def get_instruction(self, location : int):
+        # Builds a standalone Instruction object from the stored fields; used for display and saving
+        return Instruction(
+            opcodes[self.opcode[location]],
+            modifiers[self.modifier[location]],
+            addressing_modes[self.a_mode_1[location]],
+            self.address_1[location],
+            addressing_modes[self.a_mode_2[location]],
+            self.address_2[location]
+        )
+
+    def set_instruction(self, location : int, instruction : Instruction):
+        # Writes an Instruction object into the core; negative addresses are folded into the core as ICWS 94 requires
+        self.set_fields(location, encode_instruction(instruction, self.size))
+
+    def set_fields(self, location : int, fields : tuple):
+        # Writes an instruction already encoded by encode_instruction
+        self.opcode[location], self.modifier[location], self.a_mode_1[location], self.address_1[location], self.a_mode_2[location], self.address_2[location] = fields
+        self.handlers[location] = None
+
+    def copy_instruction(self, source : int, target : int):
+        # Copies every instruction field of one tile onto another
+        self.opcode[target] = self.opcode[source]
+        self.modifier[target] = self.modifier[source]
+        self.a_mode_1[target] = self.a_mode_1[source]
+        self.address_1[target] = self.address_1[source]
+        self.a_mode_2[target] = self.a_mode_2[source]
+        self.address_2[target] = self.address_2[source]
+        self.handlers[target] = None
+
+    def instructions_equal(self, location_1 : int, location_2 : int):
+        c1 = self.opcode[location_1] == self.opcode[location_2] and self.modifier[location_1] == self.modifier[location_2]
+        c2 = self.a_mode_1[location_1] == self.a_mode_1[location_2] and self.address_1[location_1] == self.address_1[location_2]
+        c3 = self.a_mode_2[location_1] == self.a_mode_2[location_2] and self.address_2[location_1] == self.address_2[location_2]
+        return c1 and c2 and c3
+
+    def set_color(self, location : int, color : int):
+        # Recolours a tile, keeping the colour counts up to date
+        self.color_counts[self.color[location] & ~CROSS] -= 1
+        self.color_counts[color & ~CROSS] += 1
+        self.color[location] = color
+        self.dirty.add(location)
+
+    def get_color(self, location : int):
+        # The colour a tile is displayed with; tiles owned by eliminated warriors are crossed
+        if self.eliminated[self.owner[location]]: return self.color[location] | CROSS
+        return self.color[location]
+
+    def mark_read(self, location : int):
+        self.read_marked[location] = 1
+        self.read_marks.append(location)
+        self.dirty.add(location)
+
+    def clear_read_marks(self):
+        for location in self.read_marks:
+            self.read_marked[location] = 0
+            self.dirty.add(location)
+        self.read_marks = []
+
+    def highlight(self, location : int):
+        self.highlighted[location] = 1
+        self.highlights.append(location)
+        self.dirty.add(location)
+
+    def clear_highlights(self):
+        for location in self.highlights:
+            self.highlighted[location] = 0
+            self.dirty.add(location)
+        self.highlights = []
+
+    def take_dirty(self):
+        # Returns every tile changed since the last call, and starts a new set; the swap is atomic, so the simulation can keep running
+        dirty, self.dirty = self.dirty, set()
+        if self.full_redraw:
+            self.full_redraw = False
+            return range(self.size)
+        return dirty
+
+    def mark_all_dirty(self):
+        # Forces the next frame to redraw the whole core
+        self.full_redraw = True
@@ -0,0 +1,476 @@
+# This file contains the headless MARS engine
+# All match state is kept on the Match instance, and no UI libraries are imported, so matches can run anywhere
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from hashlib import sha256
+from multiprocessing import get_all_start_methods, get_context
+from random import Random, randrange
+from core import Core, CROSS, DAT, encode_instruction
+from hooks import Hooks
+from journal import Journal, JournaledWrites
+import executor
+
+# Set by run_forks just before its worker processes are forked, so they inherit the match instead of having it pickled
+fork_match = None
+fork_continuations = []
+
+def derive_seed(seed : int, *keys):
+    # Derives an independent seed from a match seed and any number of keys, such as a round number
+    # Hashing makes the result identical on every machine and in every process
+    text = "/".join(str(key) for key in (seed,) + keys)
+    return int.from_bytes(sha256(text.encode()).digest()[:8], "big")
+
+class MatchResult:
+    def __init__(self, cycles : int, completed : bool, survivors : list, drawn_at : int = None):
+        self.cycles = cycles
+        self.completed = completed
+        # Ids of all warriors still alive
+        self.survivors = survivors
+        # Cycle at which the match was found to repeat itself, and ended early as a draw; None if it was played out
+        self.drawn_at = drawn_at
+
+        # A match is only won once it is over with one warrior remaining
+        self.winner = survivors[0] if completed and len(survivors) == 1 else None
+
+class Match:
+    def __init__(self, warriors : list, field_size : int = 8000, max_cycles : int = 80000, max_length : int = 100, max_processes : int = 8000, seed : int = None, round_index : int = 0, min_distance : int = 0, sparse : bool = False, detect_draws : bool = False):
+        self.field_size = field_size
+        self.max_cycles = max_cycles
+        self.max_length = max_length
+        self.max_processes = max_processes
+        # Minimum distance between the starting positions of any two warriors; warriors never overlap, regardless
+        self.min_distance = min_distance
+
+        if seed is None: seed = randrange(2 ** 32)
+        self.seed = seed
+
+        # Read markers are only useful for display, so they are disabled unless requested
+        self.mark_reads = False
+        # Matches which return to an earlier state will repeat it forever, so with this set they end as a draw as soon as that is found
+        self.detect_draws = detect_draws
+        # TraceWriter recording the match, if any; see record
+        self.trace = None
+        # Journal of the latest cycles, if one is kept; see keep_journal
+        self.journal = None
+        # Watchpoints the match breaks on, if any are set; see watch
+        self.watches = None
+        # Hooks told about every event of the match, if any are registered; see add_hook
+        self.hooks = None
+
+        # Every warrior entered, and its load file encoded for this core size, so rounds can be set up without converting instructions
+        # Warrior ids stay the same for the whole match, and only need to be unique and below CROSS - 1
+        self.entrants = warriors
+        warrior_count = max((warrior.id for warrior in warriors), default=-1) + 1
+        if warrior_count >= CROSS:
+            raise ValueError(f"Warrior ids must be below {CROSS - 1}")
+        self.load_files = [[encode_instruction(line, field_size) for line in warrior.load_file] for warrior in warriors]
+
+        # Huge cores can be kept sparse while they are mostly empty
+        self.core = Core(field_size, sparse, detect_draws, warrior_count)
+        self.setup_round(round_index)
+
+    def reset(self, round_index : int):
+        # Restarts the match as the given round, reusing the existing core
+        # A trace only holds one round, so recording stops, and the journal cannot undo past the start of the round
+        if self.trace is not None: self.stop_recording()
+        if self.journal is not None: self.journal.clear()
+        self.core.reset()
+        self.setup_round(round_index)
+
+    def setup_round(self, round_index : int):
+        # Each round of a match draws its placements from its own stream, so any round can be replayed on its own
+        self.round_index = round_index
+        self.rng = Random(derive_seed(self.seed, round_index))
+
+        self.cycle = 0
+        self.completed = False
+        self.drawn_at = None
+        # Core hash of the state saved for draw detection, the state itself, and the cycle after which the next is saved
+        self.saved_hash = None
+        self.saved_state = None
+        self.next_save = 1
+
+        # Warriors still alive, and their process queues at the same indices
+        self.warriors = []
+        self.queues = []
+
+        for i, position in enumerate(self.get_placements(len(self.entrants))):
+            self.place_warrior(i, position)
+
+    def fork(self):
+        # Returns an independent match continuing from this one's current state, so it can be played differently
+        # Only the core's arrays and the queues are copied; nothing is replayed
+        match = copy(self)
+        match.core = self.core.copy()
+        match.rng = Random()
+        match.trace = None
+        match.journal = None
+        match.watches = None
+        match.hooks = None
+        match.restore_state(self)
+        return match
+
+    def snapshot(self):
+        # A snapshot is simply a fork which is kept aside, to restore from later
+        return self.fork()
+
+    def restore(self, snapshot):
+        # Puts the match back into the state of a snapshot (or any fork of the same match), which is left untouched
+        # The core is restored in place, so anything displaying it keeps working
+        # A trace can only follow the match forwards, so recording stops, and the journal no longer leads up to the match's state
+        if self.trace is not None: self.stop_recording()
+        if self.journal is not None: self.journal.clear()
+        self.core.restore(snapshot.core)
+        self.restore_state(snapshot)
+
+    def restore_state(self, snapshot):
+        # Restores everything but the core from a snapshot
+        self.rng.setstate(snapshot.rng.getstate())
+
+        self.round_index = snapshot.round_index
+        self.cycle = snapshot.cycle
+        self.completed = snapshot.completed
+        self.drawn_at = snapshot.drawn_at
+        self.warriors = snapshot.warriors[:]
+        self.queues = [queue.copy() for queue in snapshot.queues]
+
+        # The state saved for draw detection is never changed, only replaced, so it can be shared
+        self.saved_hash = snapshot.saved_hash
+        self.saved_state = snapshot.saved_state
+        self.next_save = snapshot.next_save
+
+    def record(self, trace):
+        # Starts recording every cycle from now on into a TraceWriter, starting with the current state
+        # Recorded matches take a slower path through step, which is only used while recording
+        trace.start(self)
+        self.trace = trace
+        self.update_written()
+
+    def stop_recording(self):
+        # Finishes the trace, and returns to the fast path unless a journal is kept
+        self.trace.close()
+        self.trace = None
+        self.update_written()
+
+    def keep_journal(self, cycles : int):
+        # Starts journaling the given amount of latest cycles, so they can be undone with step_back
+        # Like recording, this takes the slower path through step
+        self.journal = Journal(cycles)
+        self.update_written()
+
+    def stop_journal(self):
+        self.journal = None
+        self.update_written()
+
+    def watch(self, watches):
+        # Breaks on the given watchpoints; the match stops at the end of any cycle one of them is hit in, and the hit is left in watches.hit
+        # Like recording, this takes the slower path through step, so watches should be set back to None once none are left
+        self.watches = watches
+        self.update_written()
+
+    def add_hook(self, event : str, callback, batched : bool = False):
+        # Calls the callback on every event of the given kind, or with a batch of them after every call to step; see hooks.py
+        # Like recording, this takes the slower path through step, until every hook is removed again
+        if self.hooks is None: self.hooks = Hooks()
+        self.hooks.add(event, callback, batched)
+        self.update_written()
+
+    def remove_hook(self, event : str, callback):
+        self.hooks.remove(event, callback)
+        if not self.hooks: self.hooks = None
+        self.update_written()
+
+    def update_written(self):
+        # Instrumented matches need their core to list every tile written, and journaled ones to save them before they are
+        if self.journal is not None:
+            written = JournaledWrites(self.core)
+        elif self.trace is not None or self.watches is not None or self.hooks is not None:
+            written = []
+        else:
+            written = None
+
+        # Handlers compiled so far only list what they write if the core already did
+        if (written is None) != (self.core.written is None): self.core.clear_handlers()
+        self.core.written = written
+
+    def step_back(self, cycles : int = 1):
+        # Undoes up to the given amount of cycles kept in the journal, without re-simulating them; returns how many were undone
+        # A trace can only follow the match forwards, so recording stops
+        if self.trace is not None: self.stop_recording()
+
+        undone = 0
+        while undone < cycles and self.journal:
+            self.journal.undo_cycle(self)
+            undone += 1
+
+        return undone
+
+    def get_placements(self, warrior_count : int):
+        # Picks a starting position for every warrior at once, so placement never has to be retried
+        # Each warrior is given a window of the separation distance, and the remaining free tiles are split between the gaps after each window
+        separation = max(self.max_length, self.min_distance) if warrior_count > 1 else self.max_length
+        free_tiles = self.field_size - separation * warrior_count
+        if free_tiles < 0:
+            raise ValueError(f"{warrior_count} warriors cannot be placed {separation} tiles apart in a core of size {self.field_size}")
+
+        # Every way of splitting the free tiles into one gap per warrior is equally likely; the gaps lie between sampled cut points
+        cuts = [-1] + sorted(self.rng.sample(range(free_tiles + warrior_count - 1), warrior_count - 1)) + [free_tiles + warrior_count - 1]
+        gaps = [cuts[i + 1] - cuts[i] - 1 for i in range(warrior_count)]
+
+        # The layout is rotated to a random position, and warriors are assigned to the windows in a random order
+        order = list(range(warrior_count))
+        self.rng.shuffle(order)
+        position = self.rng.randrange(self.field_size)
+
+        placements = [0] * warrior_count
+        for i, gap in zip(order, gaps):
+            placements[i] = position
+            position = (position + separation + gap) % self.field_size
+
+        return placements
+
+    def place_warrior(self, index : int, warrior_pos : int):
+        # Place the entrant at the given index at the given position
+        warrior = self.entrants[index]
+
+        i = warrior_pos
+        for fields in self.load_files[index]:
+            self.core.set_fields(i % self.field_size, fields)
+            self.core.set_color(i % self.field_size, (warrior.id + 1) | CROSS)
+            i += 1
+
+        self.warriors.append(warrior)
+        self.queues.append(deque([warrior_pos]))
+
+    def step(self, cycles : int = 1, first : int = 0):
+        # Runs up to the given amount of cycles, stopping early if the match ends
+        # The first cycle can be resumed part way through, starting at the living warrior with the given index
+        cycles = min(cycles, self.max_cycles - self.cycle)
+        if self.trace is not None or self.journal is not None or self.watches is not None or self.hooks is not None: return self.step_instrumented(cycles, first)
+
+        # Every process costs the same handful of lookups, so the loop below is execute_process inlined, with the core's arrays held locally
+        # Warriors with thousands of processes still only run one per cycle, so this per-process overhead is what they spend their time on
+        core = self.core
+        opcode = core.opcode
+        owner = core.owner
+        color = core.color
+        handlers = core.handlers
+        queues = self.queues
+        warriors = self.warriors
+        limit = self.max_processes
+        mark_reads = self.mark_reads
+        detect_draws = self.detect_draws
+
+        for k in range(cycles):
+            if self.completed: break
+
+            if core.sparse and core.is_too_full():
+                # The core's arrays are replaced, so they must be fetched again
+                core.densify()
+                opcode = core.opcode
+                owner = core.owner
+                color = core.color
+                handlers = core.handlers
+
+            # Each warrior executes one process per cycle
+            i = first
+            first = 0
+            while i < len(queues):
+                queue = queues[i]
+                warrior = warriors[i].id + 1
+                location = queue.popleft()
+
+                if opcode[location] != DAT or owner[location] == 0:
+                    owner[location] = warrior
+                    if color[location] != warrior:
+                        core.color_counts[color[location] & ~CROSS] -= 1
+                        core.color_counts[warrior] += 1
+                        color[location] = warrior
+                        core.dirty.add(location)
+
+                if mark_reads: core.mark_read(location)
+
+                handler = handlers[location]
+                if handler is None:
+                    handler = executor.get_handler(core, location)
+                handler(core, location, queue, limit)
+
+                if not queue:
+                    # Warrior has no remaining processes and is eliminated
+                    self.eliminate(i)
+                    continue
+
+                i += 1
+
+            self.cycle += 1
+
+            # The state only needs a closer look if its core hash matches the saved state's, or it is due to be saved
+            if detect_draws and (core.core_hash == self.saved_hash or self.cycle == self.next_save) and not self.completed and self.repeats_state():
+                # Every warrior will survive until the cycle limit
+                self.drawn_at = self.cycle
+                self.completed = True
+
+        if self.cycle >= self.max_cycles:
+            self.completed = True
+
+        return self.result()
+
+    def step_instrumented(self, cycles : int, first : int):
+        # The loop in step, for instrumented matches; every process is run through execute_process, then recorded, journaled, checked against the watches and passed to the hooks
+        core = self.core
+        trace = self.trace
+        journal = self.journal
+        watches = self.watches
+        hooks = self.hooks
+        written = core.written
+        hit = False
+        was_completed = self.completed
+
+        for k in range(cycles):
+            if self.completed: break
+
+            if core.sparse and core.is_too_full():
+                core.densify()
+
+            if journal is not None: journal.start_cycle(self)
+
+            i = first
+            first = 0
+            while i < len(self.queues):
+                queue = self.queues[i]
+                warrior = self.warriors[i]
+                location = queue[0]
+                length = len(queue)
+                owner = core.owner[location]
+                color = core.color[location]
+
+                self.execute_process(queue, warrior.id)
+                successors = len(queue) - length + 1
+
+                if trace is not None: trace.record_process(warrior.id, location, successors, queue, written)
+                if journal is not None: journal.record_process(i, location, successors, owner, color, written.take_prior(), None if queue else warrior)
+                if watches is not None and watches.check(self.cycle, warrior.id, location, length, len(queue), written): hit = True
+                if hooks is not None: hooks.record_process(self.cycle, warrior.id, location, successors, queue, written)
+                written.clear()
+
+                if not queue:
+                    self.eliminate(i)
+                    if hooks is not None: hooks.emit("eliminate", (self.cycle, warrior.id))
+                    continue
+
+                i += 1
+
+            self.cycle += 1
+            if trace is not None: trace.end_cycle()
+
+            if self.detect_draws and (core.core_hash == self.saved_hash or self.cycle == self.next_save) and not self.completed and self.repeats_state():
+                self.drawn_at = self.cycle
+                self.completed = True
+
+            if hit: break
+
+        if self.cycle >= self.max_cycles:
+            self.completed = True
+
+        if hooks is not None:
+            if self.completed and not was_completed: hooks.emit("end", (self.cycle, self.result()))
+            hooks.flush()
+
+        return self.result()
+
+    def run(self):
+        # Runs the match to completion
+        return self.step(self.max_cycles - self.cycle)
+
+    def result(self):
+        # A match ended as a draw is reported as lasting to the cycle limit, as it would have
+        cycles = self.cycle if self.drawn_at is None else self.max_cycles
+        return MatchResult(cycles, self.completed, [warrior.id for warrior in self.warriors], self.drawn_at)
+
+    def repeats_state(self):
+        # Brent's cycle detection: the state after each cycle is compared with the one saved after the latest power of two cycle,
+        # which finds any repeat within a few times the length of the match before it
+        # The state is everything which decides how the match continues: the living warriors, their queues in order, and the instructions
+        # The core hash is only a quick filter; a repeat is only reported if the whole state matches, and the queues are compared first,
+        # as the core often stays the same while warriors move through code they do not change
+        core = self.core
+        if core.core_hash == self.saved_hash:
+            ids, queues, fields = self.saved_state
+            if [warrior.id for warrior in self.warriors] == ids and self.queues == queues and core.get_fields() == fields:
+                return True
+
+        if self.cycle == self.next_save:
+            self.saved_hash = core.core_hash
+            self.saved_state = ([warrior.id for warrior in self.warriors], [queue.copy() for queue in self.queues], core.copy_fields())
+            self.next_save *= 2
+
+        return False
+
+    def territory(self, warrior_id : int):
+        # Fraction of the core currently coloured by the warrior
+        return self.core.color_counts[warrior_id + 1] / self.field_size
+
+    def eliminate(self, index : int):
+        warrior_id = self.warriors[index].id
+        self.warriors.pop(index)
+        self.queues.pop(index)
+
+        # Every tile owned by the eliminated warrior is now displayed crossed out, which needs a full redraw
+        self.core.eliminated[warrior_id + 1] = 1
+        self.core.mark_all_dirty()
+
+        # Only one warrior remains, and is the winner
+        if len(self.warriors) <= 1:
+            self.completed = True
+
+    def execute_process(self, queue : deque, warrior : int):
+        # The main execution function; the queue holds the locations of all of the warrior's processes
+        location = queue.popleft()
+
+        core = self.core
+
+        if core.opcode[location] != DAT or core.owner[location] == 0:
+            # Apply read marker to the currently targeted instruction
+            core.owner[location] = warrior + 1
+            if core.color[location] != warrior + 1:
+                # This is Core.set_color, inlined as it runs on almost every cycle
+                core.color_counts[core.color[location] & ~CROSS] -= 1
+                core.color_counts[warrior + 1] += 1
+                core.color[location] = warrior + 1
+                core.dirty.add(location)
+
+        if self.mark_reads: core.mark_read(location)
+
+        self.evaluate_instruction(location, queue)
+
+    def evaluate_instruction(self, location : int, queue : deque):
+        # Executes the instruction at the location using its compiled handler, which queues the process' successors
+        handler = self.core.handlers[location]
+        if handler is None:
+            handler = executor.get_handler(self.core, location)
+
+        handler(self.core, location, queue, self.max_processes)
+
+def run_fork(index : int):
+    return fork_continuations[index](fork_match.fork())
+
+def run_forks(match : Match, continuations : list, workers : int = None):
+    # Plays many continuations of a match from its current state, and returns what each continuation returned, in order
+    # Each continuation is called with its own fork of the match, which it can change before running it, for instance by rewriting a warrior's code
+    # Where the OS supports it, the forks run in worker processes which inherit the match's memory copy-on-write, so the shared prefix is neither replayed nor copied
+    # Continuations are never pickled, so they can be lambdas, but what they return must be picklable
+    global fork_match, fork_continuations
+
+    if "fork" not in get_all_start_methods():
+        return [continuation(match.fork()) for continuation in continuations]
+
+    fork_match = match
+    fork_continuations = continuations
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("fork")) as pool:
+            return list(pool.map(run_fork, range(len(continuations))))
+    finally:
+        fork_match = None
+        fork_continuations = []
@@ -0,0 +1,232 @@
+# This file compiles core instructions into specialised handler functions
+# Each distinct opcode/modifier/addressing mode combination is compiled once, so no string matching is needed at runtime
+# Every value written to the core is reduced modulo the core size, as ICWS 94 requires
+
+from core import CROSS, addressing_modes, modifiers, opcodes
+
+# Compiled handlers, keyed by (opcode, modifier, a_mode_1, a_mode_2) as stored in the core
+handler_cache = {}
+
+# Source and target fields used by each modifier, as (target field, source field) pairs
+# For instance, .AB reads the A-field of the source and writes the B-field of the target
+field_pairs = {
+    "A": [("A", "A")],
+    "B": [("B", "B")],
+    "AB": [("B", "A")],
+    "BA": [("A", "B")],
+    "F": [("A", "A"), ("B", "B")],
+    "X": [("A", "B"), ("B", "A")],
+    "I": [("A", "A"), ("B", "B")]
+}
+
+# Fields tested by the conditional jumps; these only ever inspect the target
+jump_fields = {
+    "A": ["A"], "AB": ["A"],
+    "B": ["B"], "BA": ["B"],
+    "F": ["A", "B"], "X": ["A", "B"], "I": ["A", "B"]
+}
+
+# Arrays holding each field's mode and address
+mode_arrays = {"A": "state.a_mode_1", "B": "state.a_mode_2"}
+
+# Weight of each field in a tile's hash; the weighted sum of a tile's fields is different for every distinct instruction
+hash_weights = {
+    "A": "1", "B": "n",
+    "state.a_mode_2": "n2", "state.a_mode_1": "8 * n2", "state.modifier": "64 * n2", "state.opcode": "512 * n2"
+}
+
+def get_handler(state, location : int):
+    # Returns the handler for the instruction at a location, compiling it if it has not been seen before
+    # Cores which keep a hash are given handlers which also update it, and recorded cores handlers which list what they write
+    key = (state.opcode[location], state.modifier[location], state.a_mode_1[location], state.a_mode_2[location], state.hash_keys is not None, state.written is not None)
+    handler = handler_cache.get(key)
+    if handler is None:
+        handler = handler_cache[key] = compile_handler(*key)
+
+    state.handlers[location] = handler
+    return handler
+
+def compile_handler(opcode : int, modifier : int, a_mode_1 : int, a_mode_2 : int, hashed : bool = False, recorded : bool = False):
+    # Handlers take the core, the executing location and the warrior's process queue,
+    # and append the process' successor(s) to the queue; a process which dies simply appends nothing
+    # New processes are only spawned while the queue holds fewer than the limit, as ICWS 94 requires
+    # Hashed handlers also add every change they make to the core's fields to the core's hash
+    # Recorded handlers append every tile to the core's written list before they change it
+    opcode = opcodes[opcode]
+    modifier = modifiers[modifier]
+
+    lines = [
+        "def handler(state, pc, q, limit):",
+        "    A = state.address_1",
+        "    B = state.address_2",
+        "    n = state.size",
+        # Both fields are read before either operand is evaluated, so increments cannot affect the other operand
+        "    v1 = A[pc]",
+        "    v2 = B[pc]"
+    ]
+    if hashed:
+        lines += [
+            "    K = state.hash_keys",
+            "    n2 = n * n"
+        ]
+    lines += ["    " + line for line in get_operand_lines(addressing_modes[a_mode_1], "v1", "l1", hashed, recorded)]
+    lines += ["    " + line for line in get_operand_lines(addressing_modes[a_mode_2], "v2", "l2", hashed, recorded)]
+    lines += ["    " + line for line in get_opcode_lines(opcode, modifier, hashed, recorded)]
+
+    namespace = {"CROSS": CROSS}
+    exec(compile("\n".join(lines), f"<{opcode}.{modifier} {addressing_modes[a_mode_1]} {addressing_modes[a_mode_2]}>", "exec"), namespace)
+    return namespace["handler"]
+
+def get_write_lines(array : str, location : str, value : str, hashed : bool, recorded : bool = False):
+    # Generates code writing a value into one field of a tile
+    lines = [f"state.written.append({location})"] if recorded else []
+    if not hashed:
+        return lines + [f"{array}[{location}] = {value}"]
+
+    return lines + [
+        f"new = {value}",
+        f"state.core_hash += K[{location}] * (new - {array}[{location}]) * {hash_weights[array]}",
+        f"{array}[{location}] = new"
+    ]
+
+def get_operand_lines(mode : str, value : str, result : str, hashed : bool = False, recorded : bool = False):
+    # Converts an addressing mode-value pair to code evaluating its absolute location
+    match mode:
+        case "#":
+            # Immediate addressing always evaluates to $0
+            return [f"{result} = pc"]
+        case "$":
+            # Relative
+            return [f"{result} = (pc + {value}) % n"]
+        case "*" | "@":
+            # A- or B-field indirect
+            field = "A" if mode == "*" else "B"
+            return [
+                f"ptr = (pc + {value}) % n",
+                f"{result} = (ptr + {field}[ptr]) % n"
+            ]
+        case "{" | "<":
+            # Predecremented A- or B-field indirect
+            field = "A" if mode == "{" else "B"
+            return [
+                f"ptr = (pc + {value}) % n",
+                f"{result} = (ptr + {field}[ptr]) % n"
+            ] + get_write_lines(field, "ptr", f"({field}[ptr] - 1) % n", hashed, recorded)
+        case "}" | ">":
+            # Postincremented A- or B-field indirect
+            field = "A" if mode == "}" else "B"
+            return [
+                f"ptr = (pc + {value}) % n",
+                f"{result} = (ptr + {field}[ptr]) % n"
+            ] + get_write_lines(field, "ptr", f"({field}[ptr] + 1) % n", hashed, recorded)
+
+def get_opcode_lines(opcode : str, modifier : str, hashed : bool = False, recorded : bool = False):
+    # Generates the body of a handler for the given opcode and modifier
+    advance = ["q.append((pc + 1) % n)"]
+    skip = ["q.append((pc + 2) % n)"]
+
+    match opcode:
+        case "DAT":
+            # Kills the current process
+            return ["return"]
+
+        case "MOV":
+            # Copies fields of the source (l1) into fields of the target (l2)
+            if modifier == "I":
+                # This is Core.copy_instruction, inlined as imps and stones run little else
+                arrays = ("state.opcode", "state.modifier", "state.a_mode_1", "A", "state.a_mode_2", "B")
+                lines = [f"{array}[l2] = {array}[l1]" for array in arrays]
+                if hashed:
+                    # The whole tile changes at once, so its hash is updated in one step
+                    change = " + ".join(f"({array}[l1] - {array}[l2]) * {hash_weights[array]}" for array in arrays)
+                    lines.insert(0, f"state.core_hash += K[l2] * ({change})")
+                if recorded:
+                    lines.insert(0, "state.written.append(l2)")
+            else:
+                # Sources are read before any target is written, in case both are the same tile
+                lines = []
+                for i, (target, source) in enumerate(field_pairs[modifier]):
+                    lines.append(f"mode_{i} = {mode_arrays[source]}[l1]")
+                    lines.append(f"value_{i} = {source}[l1]")
+                for i, (target, source) in enumerate(field_pairs[modifier]):
+                    lines += get_write_lines(mode_arrays[target], "l2", f"mode_{i}", hashed, recorded)
+                    lines += get_write_lines(target, "l2", f"value_{i}", hashed, recorded)
+
+            # The target's instruction has changed, so its handler must be recompiled
+            # A whole instruction copy keeps the source's handler, however, which spares moving code such as imps a lookup on every cycle
+            lines.append("state.handlers[l2] = state.handlers[l1]" if modifier == "I" else "state.handlers[l2] = None")
+            # This is Core.set_color, inlined as it runs on almost every MOV
+            lines.append("C = state.color")
+            lines.append("if C[l2] != C[pc]:")
+            lines.append("    counts = state.color_counts")
+            lines.append("    counts[C[l2] & ~CROSS] -= 1")
+            lines.append("    counts[C[pc] & ~CROSS] += 1")
+            lines.append("    C[l2] = C[pc] | CROSS")
+            lines.append("    state.dirty.add(l2)")
+            return lines + advance
+
+        case "ADD" | "SUB" | "MUL" | "DIV" | "MOD":
+            # Arithmetic on the target using the source; the source is always the current instruction unless indirect addressing is used
+            operator = {"ADD": "+", "SUB": "-", "MUL": "*", "DIV": "//", "MOD": "%"}[opcode]
+            lines = []
+            for i, (target, source) in enumerate(field_pairs[modifier]):
+                lines.append(f"value_{i} = {source}[l1]")
+            for i, (target, source) in enumerate(field_pairs[modifier]):
+                if opcode in ("DIV", "MOD"):
+                    # Division by 0 kills the process
+                    # Both operands are already within the core, so the result is as well
+                    lines.append(f"if value_{i} == 0:")
+                    lines.append("    return")
+                    lines += get_write_lines(target, "l2", f"{target}[l2] {operator} value_{i}", hashed, recorded)
+                else:
+                    lines += get_write_lines(target, "l2", f"({target}[l2] {operator} value_{i}) % n", hashed, recorded)
+            return lines + advance
+
+        case "JMP":
+            # Jumps to the A-field address
+            return ["q.append(l1)"]
+
+        case "JMZ" | "JMN" | "DJN":
+            # Jumps to the A-field address depending on the target's value; DJN decrements the target first
+            lines = []
+            if opcode == "DJN":
+                for field in jump_fields[modifier]:
+                    lines += get_write_lines(field, "l2", f"({field}[l2] - 1) % n", hashed, recorded)
+
+            if opcode == "JMZ":
+                condition = " and ".join(f"{field}[l2] == 0" for field in jump_fields[modifier])
+            else:
+                condition = " or ".join(f"{field}[l2] != 0" for field in jump_fields[modifier])
+
+            lines.append(f"if {condition}:")
+            lines.append("    q.append(l1)")
+            lines.append("    return")
+            return lines + advance
+
+        case "SPL":
+            # Creates a new process at the A-field address
+            return advance + ["if len(q) < limit: q.append(l1)"]
+
+        case "SEQ" | "CMP" | "SNE" | "SLT":
+            # Skips the next instruction if the comparison between source and target passes
+            if modifier == "I" and opcode != "SLT":
+                condition = "state.instructions_equal(l1, l2)"
+            else:
+                # The pairs are stored as (target, source); SLT.I behaves like SLT.F
+                comparator = {"SEQ": "==", "CMP": "==", "SNE": "!=", "SLT": "<"}[opcode]
+                joiner = " and " if comparator == "==" else " or "
+                pairs = field_pairs["F" if modifier == "I" else modifier]
+                condition = joiner.join(f"{source}[l1] {comparator} {target}[l2]" for target, source in pairs)
+
+            if opcode == "SNE" and modifier == "I":
+                condition = f"not {condition}"
+
+            return [
+                f"if {condition}:",
+                "    " + skip[0],
+                "    return"
+            ] + advance
+
+        case _:
+            # NOP, as well as the unsupported P-space opcodes
+            return advance
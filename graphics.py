@@ -89,7 +89,7 @@ def pregenerate_tile(tile_size, border_width, fill_color, cross, highlight):
     return data
 
 # The main graphics handler
-def create_image_from_state_data(state : list, prev_state : list, field_size : int, prev_image : Image):
+def create_image_from_state_data(state : o.CoreView, field_size : int, prev_image : Image):
     # In cases of very large cores, more tiles are fit into each row to prevent excessively large windows
     if field_size > 10000:
         a_max_field_width = math.ceil(math.sqrt(field_size))
@@ -99,36 +99,29 @@ def create_image_from_state_data(state : list, prev_state : list, field_size : i
     row_count = math.ceil(field_size / a_max_field_width)
     if prev_image is None or prev_image.size != (a_max_field_width * tile_size, row_count * tile_size): # The previous image can only be used as a base if their dimensions match
         new_image = Image.new("RGB", (a_max_field_width * tile_size, row_count * tile_size))
+        redraw_all = True
     else:
         new_image = prev_image
-    if state == []: return new_image # No core is initialized
+        redraw_all = False
+    if state is None or state.snapshot is None: return new_image # No core is initialized, or the simulation has not published it yet
+
+    # Only tiles which changed since the last frame are redrawn, as drawing takes up quite a bit of CPU time
+    # A fresh image has to be created from scratch, however
+    changed_tiles = state.take_dirty()
+    if redraw_all: changed_tiles = range(field_size)
 
     # Draw the image by placing pregenerated tiles as needed
     img_data = new_image.load()
-    current_tile = 0
-    for y in range(row_count):
-        for x in range(a_max_field_width):
-            # Determine the tile's colour
-            if state[current_tile].read_marked:
-                render_color = "white"
-            else:
-                render_color = state[current_tile].color
-            if state[current_tile].highlighted:
-                render_color = "highlight_" + render_color
-
-            if prev_state == []:
-                # If no core was previously loaded, each tile must obviously be created from scratch
-                img_data = draw_tile(img_data, x * tile_size, y * tile_size, render_color)
-            elif state[current_tile] != prev_state[current_tile]:
-                # This step takes up quite a bit of CPU time, hence why it is skipped if the image would be unchanged
-                img_data = draw_tile(img_data, x * tile_size, y * tile_size, render_color)
-
-            current_tile += 1
-            if current_tile >= field_size: break
-
-        # Clever way to break out of nested loops all at once; see http://psung.blogspot.com/2007/12/for-else-in-python.html
-        else: continue
-        break
+    for tile in changed_tiles:
+        # Determine the tile's colour
+        if state.read_marked[tile]:
+            render_color = "white"
+        else:
+            render_color = o.get_tile_color_from_code(state.get_color(tile))
+        if state.highlighted[tile]:
+            render_color = "highlight_" + render_color
+
+        img_data = draw_tile(img_data, (tile % a_max_field_width) * tile_size, (tile // a_max_field_width) * tile_size, render_color)
 
     return new_image
 
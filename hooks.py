@@ -0,0 +1,69 @@
+# This file holds the hooks analyses can register on a match, to be told what happens in it without changing the engine
+# Hooks are only called from the engine's instrumented path, so a match without any runs exactly as before
+# Every event is a tuple, starting with the cycle it happened in:
+#   "exec": (cycle, warrior id, location) for every process executed
+#   "write": (cycle, warrior id, location) for every tile written, once per process writing it
+#   "spawn": (cycle, warrior id, location) for every new process, at the location it starts from
+#   "death": (cycle, warrior id, location) for every process which ended, at the location it executed
+#   "eliminate": (cycle, warrior id) once a warrior's last process has ended
+#   "end": (cycle, result) once the match is over, with its MatchResult
+# Hooks are called with the values of each event as it happens, which they must not change the match in response to
+# Batched hooks are called with a list of every event since the last batch instead, once per call to Match.step
+
+events = ("exec", "write", "spawn", "death", "eliminate", "end")
+
+class Hooks:
+    def __init__(self):
+        # Hooks called on every event, and hooks called with batches of them, by event
+        self.callbacks = {event: [] for event in events}
+        self.batched = {event: [] for event in events}
+        # Events waiting to be delivered to the batched hooks
+        self.pending = {event: [] for event in events}
+        self.update()
+
+    def __bool__(self):
+        # Whether any hook is registered
+        return bool(self.wanted)
+
+    def add(self, event : str, callback, batched : bool = False):
+        if event not in events:
+            raise ValueError(f"Unknown event {event}")
+
+        (self.batched if batched else self.callbacks)[event].append(callback)
+        self.update()
+
+    def remove(self, event : str, callback):
+        for hooks in (self.callbacks, self.batched):
+            if callback in hooks[event]: hooks[event].remove(callback)
+        self.update()
+
+    def update(self):
+        # Events any hook is registered for; the others are not even gathered
+        self.wanted = set(event for event in events if self.callbacks[event] or self.batched[event])
+
+    def emit(self, event : str, values : tuple):
+        for callback in self.callbacks[event]:
+            callback(*values)
+        if self.batched[event]: self.pending[event].append(values)
+
+    def record_process(self, cycle : int, warrior_id : int, location : int, successors : int, queue, written : list):
+        # Emits the events of one executed process; written is the core's list of tiles written by it
+        wanted = self.wanted
+
+        if "exec" in wanted: self.emit("exec", (cycle, warrior_id, location))
+        if "write" in wanted:
+            # A tile is often written more than once by the same instruction, but is only reported once
+            for tile in dict.fromkeys(written):
+                self.emit("write", (cycle, warrior_id, tile))
+        if successors == 2 and "spawn" in wanted: self.emit("spawn", (cycle, warrior_id, queue[-1]))
+        if successors == 0 and "death" in wanted: self.emit("death", (cycle, warrior_id, location))
+
+    def flush(self):
+        # Delivers every pending event to the batched hooks
+        for event in events:
+            pending = self.pending[event]
+            if not pending: continue
+
+            self.pending[event] = []
+            for callback in self.batched[event]:
+                callback(pending)
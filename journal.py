@@ -0,0 +1,74 @@
+# This file keeps a bounded journal of what the last cycles of a match changed, so they can be undone without re-simulating
+# Every executed process is journaled with what it popped from its queue, how many successors it appended,
+# and the prior fields of every tile it wrote; undoing a cycle puts these back in reverse order
+
+from collections import deque
+
+class JournaledWrites(list):
+    # Stands in for a core's written list while a journal is kept; the fields of each tile are saved before it is first written
+    def __init__(self, core):
+        super().__init__()
+        self.core = core
+        self.prior = []
+
+    def append(self, location : int):
+        if location not in self:
+            core = self.core
+            self.prior.append((location, (core.opcode[location], core.modifier[location], core.a_mode_1[location], core.address_1[location], core.a_mode_2[location], core.address_2[location]), core.color[location]))
+        super().append(location)
+
+    def take_prior(self):
+        # Returns the saved tiles of the current process, and starts a new list
+        prior, self.prior = self.prior, []
+        return prior
+
+class Journal:
+    # Ring buffer of the last cycles run; the oldest are dropped once it holds the given amount, so memory stays bounded
+    def __init__(self, cycles : int):
+        self.entries = deque(maxlen=cycles)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def start_cycle(self, match):
+        # Saves everything a cycle can change besides the core and the queues, which are journaled per process
+        self.processes = []
+        self.entries.append((
+            (match.cycle, match.completed, match.drawn_at, match.core.core_hash, match.saved_hash, match.saved_state, match.next_save),
+            self.processes
+        ))
+
+    def record_process(self, index : int, location : int, successors : int, owner : int, color : int, tiles : list, eliminated):
+        # index is the warrior's index among the living warriors when it executed; owner and color are the executed tile's before it ran
+        # eliminated is the warrior, if the process was its last
+        self.processes.append((index, location, successors, owner, color, tiles, eliminated))
+
+    def undo_cycle(self, match):
+        # Undoes the latest cycle kept, in O(tiles touched)
+        state, processes = self.entries.pop()
+        core = match.core
+
+        for index, location, successors, owner, color, tiles, eliminated in reversed(processes):
+            if eliminated is not None:
+                # Eliminated warriors are put back where they were, with an empty queue
+                match.warriors.insert(index, eliminated)
+                match.queues.insert(index, deque())
+                core.eliminated[eliminated.id + 1] = 0
+                core.mark_all_dirty()
+
+            queue = match.queues[index]
+            for k in range(successors):
+                queue.pop()
+            queue.appendleft(location)
+
+            for tile, fields, tile_color in reversed(tiles):
+                core.set_fields(tile, fields)
+                if core.color[tile] != tile_color: core.set_color(tile, tile_color)
+
+            core.owner[location] = owner
+            if core.color[location] != color: core.set_color(location, color)
+
+        match.cycle, match.completed, match.drawn_at, core.core_hash, match.saved_hash, match.saved_state, match.next_save = state
@@ -1,33 +1,27 @@
 # The main program file; acts primarily as UI manager
-print("Launching Tailwind v1.0...")
+# The simulation process is spawned from this file, so everything which sets up the UI only runs when it is launched directly
+if __name__ == "__main__": print("Launching Tailwind v1.0...")
 
 import customtkinter as ctk
 from tkinter.messagebox import showinfo
 from tkinter.filedialog import asksaveasfilename, askopenfilename
 import math
-import threading as th
 import json
 import webbrowser
 from PIL import ImageTk
 from ctypes import windll
-from random import randint
-from time import sleep
+from random import randint, Random
 from pyperclip import copy
-from copy import deepcopy
+from copy import copy as copy_object
 from os import listdir
 from datetime import datetime
 import graphics
 import options as o
 import compiler
-import process
+from engine import derive_seed
 
 # Global variables are declared in options.py
 
-o.root.geometry("450x200")
-o.root.resizable(False, False)
-o.root.title("Tailwind v1.0")
-o.root.protocol("WM_DELETE_WINDOW", o.close_all_threads)
-
 # Create the main UI class
 class App():
     def __init__(self):
@@ -35,8 +29,7 @@ class App():
         self.state_window = None
         self.detail_window = None
         self.core_label = None
-
-        self.sim_thread = None
+        self.scrub_slider = None
 
         # These are only used by the Redcode editor, but must be global as they need to be tracked between functions
         self.current_warrior = None
@@ -48,9 +41,8 @@ class App():
         # Do initial setup based on user configuration
         self.load_user_config()
 
-        # Start the background threads; graphics and simulation
-        self.sim_thread = th.Thread(target=process.simulation_clock)
-        self.sim_thread.start()
+        # Start the simulation process and the render loop
+        o.start_simulation()
         self.render_state()
 
         # Create UI elements for the main window
@@ -66,6 +58,7 @@ class App():
         self.max_speed_button = ctk.CTkCheckBox(self.bottom_container, text="Max. Simulation Speed", command=lambda: self.change_speed("max"))
         self.pause_button = ctk.CTkButton(self.bottom_container, text="Start", command=self.toggle_pause, state=ctk.DISABLED)
         self.one_step_button = ctk.CTkButton(self.bottom_container, text="Advance One Cycle", command=self.advance_one_cycle, state=ctk.DISABLED)
+        self.step_back_button = ctk.CTkButton(self.bottom_container, text="Step Back", command=self.step_back, state=ctk.DISABLED)
 
         self.core_frame = ctk.CTkFrame(self.bottom_container, fg_color="black")
         self.core_label = ctk.CTkLabel(self.core_frame, text="No Core Loaded...", text_color="white", font=("Consolas", 12), anchor="w", justify="left")
@@ -83,6 +76,7 @@ class App():
         self.speed_display.grid(row=1, column=1, sticky="nsew")
         self.max_speed_button.grid(row=2, column=0, sticky="nsew")
         self.one_step_button.grid(row=0, column=3, sticky="nsew")
+        self.step_back_button.grid(row=1, column=3, sticky="nsew")
 
         self.core_frame.grid(row=2, column=2, columnspan=2, sticky="nsew")
         self.core_label.grid(row=0, column=1, sticky="nsew")
@@ -104,7 +98,15 @@ class App():
         self.speed_control.set(0)
 
     def render_state(self):
-        # Runs ftwice per second; executes the render queue and checks for simulation completion
+        # Runs twenty times per second; takes the latest core from the simulation, executes the render queue and checks for simulation completion
+            if o.refresh_state():
+                if self.scrub_slider is not None: self.scrub_slider.set(o.state_data.snapshot.cycle)
+                # Only happens while paused after stepping, pausing or seeking, so the detail viewer can keep up
+                if o.paused: self.update_detail_window(self.detail_target, False)
+
+                location = o.take_watch_hit()
+                if location is not None: self.show_watch_hit(location)
+
             self.update_core_label()
             if o.update_requested:
                 self.update_state_canvas()
@@ -114,6 +116,10 @@ class App():
                 if not o.paused: self.toggle_pause()
                 self.pause_button.configure(text="Simulation Complete", state=ctk.DISABLED)
                 self.one_step_button.configure(state=ctk.DISABLED)
+            elif self.pause_button.cget("text") == "Simulation Complete":
+                # A finished match can be stepped back into, and a finished replay sought back into, then played again from there
+                self.pause_button.configure(text="Start", state=ctk.NORMAL)
+                self.one_step_button.configure(state=ctk.NORMAL)
             
             o.root.after(50, self.render_state)
 
@@ -121,40 +127,46 @@ class App():
         if new_speed == "max":
             # Max speed button is checked
             o.max_speed_enabled = not o.max_speed_enabled
-            return
+        else:
+            o.play_speed = o.speed_levels[math.floor(new_speed)]
+            self.speed_display.configure(text=f"{o.play_speed}x")
 
-        o.play_speed = o.speed_levels[math.floor(new_speed)]
-            
-        self.speed_display.configure(text=f"{o.play_speed}x")
+        o.send("speed", o.play_speed, o.max_speed_enabled)
 
     def toggle_pause(self):
         if o.paused:
             self.pause_button.configure(text="Pause")
             self.one_step_button.configure(state=ctk.DISABLED)
+            self.step_back_button.configure(state=ctk.DISABLED)
             if self.detail_window is not None: self.close_detail_win() # Updating the detail window on the fly is simply too resource-intensive
             o.paused = False
+            o.send("run")
         else:
             self.pause_button.configure(text="Unpause")
             self.one_step_button.configure(state=ctk.NORMAL)
+            self.step_back_button.configure(state=ctk.NORMAL)
             o.paused = True
-            o.update_requested = True # Ensure rendering is caught up with state
+            o.send("pause") # The simulation publishes its core once more, so rendering catches up with it
 
     def advance_one_cycle(self):
-        # Called when pressing the eponymous button; runs one cycle of the sim clock and updates the detail viewer
-        process.simulation_clock(True)
-        self.update_detail_window(self.detail_target, False)
+        # Called when pressing the eponymous button; the simulation runs one cycle, and the detail viewer is updated once it has been published
+        o.send("step")
+
+    def step_back(self):
+        # Undoes the latest cycle; matches keep a journal of their latest cycles for this, and replays seek back one cycle
+        o.send("step_back")
 
     def open_setup_menu(self):
         if not o.paused: self.toggle_pause()
 
         self.setup_window = ctk.CTkToplevel(o.root)
         self.setup_window.title("Match Options")
-        self.setup_window.geometry("500x300")
+        self.setup_window.geometry("500x500")
         self.setup_window.resizable(False, False)
         self.setup_window.after(201, lambda: self.setup_window.iconbitmap(f"assets/icons/icon_{o.user_config['selected_theme']}.ico")) # Workaround for a silly CTk behaviour which sets the icon only after 200ms
         self.setup_window.grab_set()
 
-        o.warriors_temp = deepcopy(o.warriors) # Reset all unsaved warriors
+        o.warriors_temp = [copy_object(warrior) for warrior in o.warriors] # Reset all unsaved warriors; their fields are only ever replaced, so shallow copies suffice
 
         random_core = ctk.IntVar()
 
@@ -170,6 +182,8 @@ class App():
         self.core_size_label = ctk.CTkLabel(self.core_size_container, font=("TkDefaultFont", 14), text="Core Size")
         self.core_size_input = ctk.CTkEntry(self.core_size_container, placeholder_text="Size...")
         self.random_button = ctk.CTkCheckBox(self.core_size_container, text="Random", command=lambda: self.core_size_input.configure(state=ctk.DISABLED if self.random_button.get() == 1 else ctk.NORMAL), variable=random_core)
+        self.seed_label = ctk.CTkLabel(self.core_size_container, text="Seed (blank for random):")
+        self.seed_input = ctk.CTkEntry(self.core_size_container, placeholder_text="Seed...")
 
         self.misc_container = ctk.CTkFrame(self.setup_window)
         self.misc_label = ctk.CTkLabel(self.misc_container, font=("TkDefaultFont", 14), text="Miscellaneous")
@@ -177,12 +191,19 @@ class App():
         self.max_cycle_input = ctk.CTkEntry(self.misc_container, placeholder_text="Cycles...")
         self.max_length_label = ctk.CTkLabel(self.misc_container, text="Max. Program Length:")
         self.max_length_input = ctk.CTkEntry(self.misc_container, placeholder_text="Length...")
+        self.max_processes_label = ctk.CTkLabel(self.misc_container, text="Max. Processes:")
+        self.max_processes_input = ctk.CTkEntry(self.misc_container, placeholder_text="Processes...")
+        self.rounds_label = ctk.CTkLabel(self.misc_container, text="Rounds:")
+        self.rounds_input = ctk.CTkEntry(self.misc_container, placeholder_text="Rounds...")
+        self.min_distance_label = ctk.CTkLabel(self.misc_container, text="Min. Distance:")
+        self.min_distance_input = ctk.CTkEntry(self.misc_container, placeholder_text="Distance...")
 
         self.setup_bottom_container = ctk.CTkFrame(self.setup_window)
         self.error_label = ctk.CTkLabel(self.setup_bottom_container, text_color="red", text="")
-        self.save_match_button = ctk.CTkButton(self.setup_bottom_container, text="Save Settings to File", command=lambda: self.validate_setup(self.core_size_input.get(), self.max_cycle_input.get(), self.max_length_input.get(), random_core.get(), True))
-        self.apply_button = ctk.CTkButton(self.setup_bottom_container, text="Apply", command=lambda: self.validate_setup(self.core_size_input.get(), self.max_cycle_input.get(), self.max_length_input.get(), random_core.get()))
+        self.save_match_button = ctk.CTkButton(self.setup_bottom_container, text="Save Settings to File", command=lambda: self.validate_setup(self.core_size_input.get(), self.max_cycle_input.get(), self.max_length_input.get(), self.max_processes_input.get(), self.rounds_input.get(), self.seed_input.get(), self.min_distance_input.get(), random_core.get(), True))
+        self.apply_button = ctk.CTkButton(self.setup_bottom_container, text="Apply", command=lambda: self.validate_setup(self.core_size_input.get(), self.max_cycle_input.get(), self.max_length_input.get(), self.max_processes_input.get(), self.rounds_input.get(), self.seed_input.get(), self.min_distance_input.get(), random_core.get()))
         self.load_match_button = ctk.CTkButton(self.setup_bottom_container, text="Import Match Settings", command=self.load_trsm_file)
+        self.load_trace_button = ctk.CTkButton(self.setup_bottom_container, text="Open Recorded Match", command=self.load_trace_file)
 
         self.warrior_container.grid(row=0, column=0, rowspan=2, sticky="nsew")
         self.core_size_container.grid(row=0, column=2, sticky="new")
@@ -198,34 +219,47 @@ class App():
         self.core_size_label.grid(row=0, column=0, sticky="nsew")
         self.core_size_input.grid(row=1, column=0, sticky="nsew")
         self.random_button.grid(row=2, column=0, sticky="nsew")
+        self.seed_label.grid(row=3, column=0, sticky="nsew")
+        self.seed_input.grid(row=4, column=0, sticky="nsew")
 
         self.misc_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
         self.max_cycle_label.grid(row=1, column=0, sticky="nsew")
         self.max_cycle_input.grid(row=2, column=0, sticky="nsew")
         self.max_length_label.grid(row=4, column=0, sticky="nsew")
         self.max_length_input.grid(row=5, column=0, sticky="nsew")
+        self.max_processes_label.grid(row=7, column=0, sticky="nsew")
+        self.max_processes_input.grid(row=8, column=0, sticky="nsew")
+        self.rounds_label.grid(row=10, column=0, sticky="nsew")
+        self.rounds_input.grid(row=11, column=0, sticky="nsew")
+        self.min_distance_label.grid(row=13, column=0, sticky="nsew")
+        self.min_distance_input.grid(row=14, column=0, sticky="nsew")
 
         self.setup_bottom_container.grid(row=2, column=0, rowspan=2, columnspan=3, sticky="nsew")
         self.error_label.grid(row=0, column=0, columnspan=5, sticky="nsew")
         self.save_match_button.grid(row=1, column=0, sticky="nsew")
         self.apply_button.grid(row=1, column=2, sticky="nsew")
         self.load_match_button.grid(row=1, column=4, sticky="nsew")
+        self.load_trace_button.grid(row=2, column=0, columnspan=5, sticky="nsew")
 
         self.setup_window.grid_rowconfigure([0, 1, 2], weight=1)
         self.setup_window.grid_columnconfigure(1, weight=1)
 
         self.warrior_container.grid_rowconfigure(list(range(2, 9)), weight=1)
 
-        self.misc_container.grid_rowconfigure([2, 3, 5], weight=1)
+        self.misc_container.grid_rowconfigure([2, 3, 5, 6, 8, 9, 11, 12, 14], weight=1)
 
         self.setup_bottom_container.grid_rowconfigure(0, weight=1)
-        self.setup_bottom_container.grid_rowconfigure(1, weight=3)
+        self.setup_bottom_container.grid_rowconfigure([1, 2], weight=3)
         self.setup_bottom_container.grid_columnconfigure([1, 3], weight=1)
         self.setup_bottom_container.grid_columnconfigure([0, 2, 4], weight=3)
 
         self.core_size_input.insert(0, o.match_options["field_size"])
         self.max_cycle_input.insert(0, o.match_options["max_cycle_count"])
         self.max_length_input.insert(0, o.match_options["max_program_length"])
+        self.max_processes_input.insert(0, o.match_options["max_processes"])
+        self.rounds_input.insert(0, o.match_options["rounds"])
+        self.min_distance_input.insert(0, o.match_options["min_distance"])
+        if o.match_options["seed"] is not None: self.seed_input.insert(0, o.match_options["seed"])
 
         self.display_warriors()
 
@@ -244,19 +278,28 @@ class App():
             new_warrior.grid(row=i, column=0, sticky="nsew")
             i += 1
 
-    def validate_setup(self, core_size, max_cycles, max_length, random_core, saving=False):
+    def validate_setup(self, core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance, random_core, saving=False):
         # Applies match settings using inputs
 
         # Error checking
         try:
+            # A blank seed picks a new random one; it is saved, so the match can be reproduced later
+            if seed == "":
+                seed = randint(0, 2 ** 32 - 1)
+            seed = int(seed)
+
             if random_core == 1:
-                core_size = randint(int(max_length) * len(o.warriors), 20000)
+                # The random core size is derived from the seed as well
+                core_size = Random(derive_seed(seed, "field_size")).randint(max(int(max_length), int(min_distance)) * len(o.warriors), 20000)
 
             core_size = int(core_size)
             max_cycles = int(max_cycles)
             max_length = int(max_length)
+            max_processes = int(max_processes)
+            rounds = int(rounds)
+            min_distance = int(min_distance)
 
-            if core_size <= 0 or max_cycles <= 0 or max_length <= 0:
+            if core_size <= 0 or max_cycles <= 0 or max_length <= 0 or max_processes <= 0 or rounds <= 0 or seed < 0 or min_distance < 0:
                 raise Exception
         except:
             self.error_label.configure(text="One or more parameters has an invalid value")
@@ -286,25 +329,35 @@ class App():
         if core_size < max_length * len(o.warriors_temp):
             self.error_label.configure(text="Core size cannot be smaller than max. warrior length * warrior count")
             return
+
+        if len(o.warriors_temp) > 1 and core_size < min_distance * len(o.warriors_temp):
+            self.error_label.configure(text="Core size cannot be smaller than min. distance * warrior count")
+            return
         
         if not saving:
-            self.apply_setup(core_size, max_cycles, max_length)
+            self.apply_setup(core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance)
         else:
             # Creates a TRSM file using match data
-            self.create_trsm_file(core_size, max_cycles, max_length, random_core)
+            self.create_trsm_file(core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance, random_core)
         
-    def apply_setup(self, core_size, max_cycles, max_length):
+    def apply_setup(self, core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance):
         # Save/reset data in preparation for match
         o.sim_completed = False
-        o.cur_cycle = 0
 
         o.match_options["field_size"] = core_size
         o.match_options["max_cycle_count"] = max_cycles
         o.match_options["max_program_length"] = max_length
+        o.match_options["max_processes"] = max_processes
+        o.match_options["rounds"] = rounds
+        o.match_options["seed"] = seed
+        o.match_options["min_distance"] = min_distance
 
-        o.warriors = deepcopy(o.warriors_temp)
+        o.warriors = [copy_object(warrior) for warrior in o.warriors_temp]
         o.initialize_core()
+        self.show_new_core()
 
+    def show_new_core(self):
+        # Readies the windows for a core which has just been loaded
         if self.detail_window is not None:
             self.close_detail_win()
         if self.state_window is not None:
@@ -314,14 +367,37 @@ class App():
 
         self.pause_button.configure(text="Start", state=ctk.NORMAL)
         self.one_step_button.configure(state=ctk.NORMAL)
+        self.step_back_button.configure(state=ctk.NORMAL)
         self.setup_window.destroy()
 
-    def create_trsm_file(self, core_size, max_cycles, max_length, random_core):
+    def load_trace_file(self):
+        # Replays a match recorded with Match.record, selected by the user
+        load_path = askopenfilename(title="Open Recorded Match", filetypes=[("Tailwind Trace", ".trace"), ("All files", "*")])
+        if load_path == "": return
+
+        try:
+            o.open_trace(load_path)
+        except (OSError, ValueError):
+            error_text = ""
+            error_text += "The selected file could not be opened.\n"
+            error_text += "It may be corrupt, still being recorded,\n"
+            error_text += "or simply not contain a Tailwind trace."
+
+            showinfo("Import Error", error_text)
+            return
+
+        self.show_new_core()
+
+    def create_trsm_file(self, core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance, random_core):
         # Create a proprietary TRSM save file from the current match data
         saved_match_data = {
             "field_size": core_size,
             "max_cycle_count": max_cycles,
             "max_program_length": max_length,
+            "max_processes": max_processes,
+            "rounds": rounds,
+            "seed": seed,
+            "min_distance": min_distance,
             "random_core": random_core
         }
 
@@ -334,7 +410,7 @@ class App():
                 # Recursively saves as JSON data
                 save_file.write(json.dumps(file_template, default=lambda o: getattr(o, '__dict__', str(o))))
 
-            self.apply_setup(core_size, max_cycles, max_length)
+            self.apply_setup(core_size, max_cycles, max_length, max_processes, rounds, seed, min_distance)
         except:
             if save_path == "": 
                 # Dismissing the popup returns an empty string; this prevents that error
@@ -362,6 +438,16 @@ class App():
 
         # Apply match data as required 
         o.match_options = load_data[1]
+        if "max_processes" not in o.match_options:
+            # Files saved before the process limit was introduced use the ICWS 94 default
+            o.match_options["max_processes"] = 8000
+        if "rounds" not in o.match_options:
+            # Likewise, older files always played a single unseeded round
+            o.match_options["rounds"] = 1
+            o.match_options["seed"] = None
+        if "min_distance" not in o.match_options:
+            # Older files only kept warriors from overlapping
+            o.match_options["min_distance"] = 0
         if load_data[1]["random_core"] == 1:
             self.random_button.select()
         else:
@@ -373,6 +459,14 @@ class App():
         self.max_cycle_input.insert(0, o.match_options["max_cycle_count"])
         self.max_length_input.delete(0, len(self.max_length_input.get()))
         self.max_length_input.insert(0, o.match_options["max_program_length"])
+        self.max_processes_input.delete(0, len(self.max_processes_input.get()))
+        self.max_processes_input.insert(0, o.match_options["max_processes"])
+        self.rounds_input.delete(0, len(self.rounds_input.get()))
+        self.rounds_input.insert(0, o.match_options["rounds"])
+        self.min_distance_input.delete(0, len(self.min_distance_input.get()))
+        self.min_distance_input.insert(0, o.match_options["min_distance"])
+        self.seed_input.delete(0, len(self.seed_input.get()))
+        if o.match_options["seed"] is not None: self.seed_input.insert(0, o.match_options["seed"])
 
         # Reconstruct warriors from loaded JSON
         o.warriors_temp = []
@@ -385,7 +479,7 @@ class App():
 
             o.warriors_temp.append(new_warrior)
 
-        o.warriors = deepcopy(o.warriors_temp)
+        o.warriors = [copy_object(warrior) for warrior in o.warriors_temp]
 
         self.edit_warrior_button.configure(state=ctk.NORMAL)
         self.remove_warrior_button.configure(state=ctk.NORMAL)
@@ -518,7 +612,8 @@ class App():
         self.export_button.configure(state=ctk.NORMAL)
 
         # The current_warrior variable is used in the below function
-        self.current_warrior.id = len(o.warriors_temp) if self.current_edit_id is None else self.current_edit_id
+        # New warriors take the next unused id, so ids stay unique after warriors are removed from the list
+        self.current_warrior.id = max((warrior.id for warrior in o.warriors_temp), default=-1) + 1 if self.current_edit_id is None else self.current_edit_id
         self.current_warrior.color = o.get_tile_color_from_id(self.current_warrior.id)
         self.current_warrior.raw_data = data
 
@@ -578,12 +673,20 @@ class App():
         self.bottom_bar_container = ctk.CTkFrame(self.state_window, width=0, height=0)
         self.pspace_button = ctk.CTkButton(self.bottom_bar_container, text="View P-Space [WIP]", state=ctk.DISABLED)
         self.detail_button = ctk.CTkButton(self.bottom_bar_container, command=self.open_detail_window, text="Open Detail Viewer")
+        if o.replay_cycles is not None:
+            # Replays can be scrubbed through, or jumped to any recorded cycle
+            self.scrub_slider = ctk.CTkSlider(self.bottom_bar_container, from_=o.replay_cycles[0], to=o.replay_cycles[1], number_of_steps=max(o.replay_cycles[1] - o.replay_cycles[0], 1), command=lambda cycle: o.send("seek", round(cycle)))
+            self.cycle_input = ctk.CTkEntry(self.bottom_bar_container, placeholder_text="Jump to Cycle...")
+            self.cycle_input.bind("<Return>", lambda event: self.jump_to_cycle(self.cycle_input.get()))
 
         self.state_canvas.grid(row=0, column=0, columnspan=2, sticky="nsew")
 
         self.bottom_bar_container.grid(row=1, column=0, sticky="nsew")
         self.pspace_button.grid(row=0, column=5, sticky="nsew")
         self.detail_button.grid(row=0, column=6, sticky="nsew")
+        if self.scrub_slider is not None:
+            self.scrub_slider.grid(row=0, column=0, columnspan=3, sticky="ew")
+            self.cycle_input.grid(row=0, column=4, sticky="nsew")
 
         self.state_window.grid_rowconfigure(0, weight=1)
         self.state_window.grid_rowconfigure(1, weight=0) # All widgets on this row are forced to their minimum size
@@ -602,10 +705,10 @@ class App():
         # Ignore if function is called while the render queue is empty
         if not o.update_requested: return
         # If core is unloaded while window is open, close it
-        if o.state_data == []: self.state_window.destroy()
+        if o.state_data is None: self.state_window.destroy()
 
         time = datetime.timestamp(datetime.now())
-        o.state_image = graphics.create_image_from_state_data(o.state_data, o.prev_state_data, o.match_options["field_size"], o.state_image)
+        o.state_image = graphics.create_image_from_state_data(o.state_data, o.match_options["field_size"], o.state_image)
         o.resized_state_image = o.state_image.resize((800, round(o.state_image.height * (800 / o.state_image.width))))
         o.root.display_image = display_image = ImageTk.PhotoImage(o.resized_state_image)
         self.state_canvas.create_image((405, o.resized_state_image.height // 2 + 5), image=display_image)
@@ -617,13 +720,18 @@ class App():
         self.state_window.geometry(f"{round(810 / scale_factor)}x{round(o.resized_state_image.height / scale_factor) + 40}")
 
         o.update_requested = False
-        
-        # Copy updates to the previous state data
-        o.prev_state_data = deepcopy(o.state_data)
     
+    def jump_to_cycle(self, cycle):
+        # Replays load the nearest keyframe and only replay the cycles after it, so any cycle can be jumped to at once
+        try: cycle = int(cycle)
+        except ValueError: return
+
+        o.send("seek", cycle)
+
     def close_state_win(self):
         self.state_window_button.configure(state=ctk.NORMAL, text="View Core")
         self.state_window.destroy()
+        self.scrub_slider = None
 
     def open_detail_window(self):
         self.detail_target = 0
@@ -634,7 +742,7 @@ class App():
 
         self.detail_window = ctk.CTkToplevel(o.root)
         self.detail_window.title("Core Details")
-        self.detail_window.geometry("300x320" if o.deghost_button_enabled else "300x300")
+        self.detail_window.geometry("300x370")
         self.detail_window.resizable(False, False)
         self.detail_window.after(201, lambda: self.detail_window.iconbitmap(f"assets/icons/icon_{o.user_config['selected_theme']}.ico"))
         self.detail_window.protocol("WM_DELETE_WINDOW", self.close_detail_win)
@@ -654,14 +762,20 @@ class App():
         self.down_one_button = ctk.CTkButton(self.options_container, text="↓", width=30, command=lambda: self.update_detail_window(self.detail_target + 1, False))
         self.down_ten_button = ctk.CTkButton(self.options_container, text="+10", width=30, command=lambda: self.update_detail_window(self.detail_target + 10, False))
 
-        self.deghost_button = ctk.CTkButton(self.detail_window, text="Redraw Core", command=self.deghost)
+        # Watchpoints on the address at the top of the viewer; replays are not played through the engine, so they cannot be watched
+        watch_state = ctk.NORMAL if o.replay_cycles is None else ctk.DISABLED
+        self.watch_container = ctk.CTkFrame(self.detail_window)
+        self.write_watch_box = ctk.CTkCheckBox(self.watch_container, text="Break on Write", state=watch_state, command=lambda: self.toggle_watch(o.write_watches, "watch_writes", self.write_watch_box))
+        self.execute_watch_box = ctk.CTkCheckBox(self.watch_container, text="Break on Execute", state=watch_state, command=lambda: self.toggle_watch(o.execute_watches, "watch_execution", self.execute_watch_box))
+        self.process_threshold_input = ctk.CTkEntry(self.watch_container, placeholder_text="Break at Process Count...")
+        if o.process_threshold is not None: self.process_threshold_input.insert(0, o.process_threshold)
+        self.process_threshold_input.configure(state=watch_state)
+        self.process_threshold_input.bind("<Return>", lambda event: self.set_process_threshold(self.process_threshold_input.get()))
 
         self.search_bar.grid(row=0, column=0, columnspan=2, sticky="nsew")
         self.data_container.grid(row=1, column=0, sticky="nsew")
         self.options_container.grid(row=1, column=1, sticky="ns")
-
-        if o.deghost_button_enabled:
-            self.deghost_button.grid(row=2, column=0, sticky="nsew")
+        self.watch_container.grid(row=2, column=0, columnspan=2, sticky="nsew")
 
         for i in range(len(self.info_labels)):
             self.info_labels[i].grid(row=i, column=0, sticky="nsew")
@@ -671,6 +785,10 @@ class App():
         self.down_one_button.grid(row=2, column=0, sticky="nsew")
         self.down_ten_button.grid(row=3, column=0, sticky="nsew")
 
+        self.write_watch_box.grid(row=0, column=0, sticky="nsew")
+        self.execute_watch_box.grid(row=0, column=1, sticky="nsew")
+        self.process_threshold_input.grid(row=1, column=0, columnspan=2, sticky="nsew")
+
         self.detail_window.grid_rowconfigure(1, weight=1)
         self.detail_window.grid_columnconfigure(0, weight=1)
 
@@ -679,10 +797,14 @@ class App():
         self.options_container.grid_rowconfigure([0, 1, 2, 3], weight=1)
         self.options_container.grid_columnconfigure(0, weight=1)
 
+        self.watch_container.grid_columnconfigure([0, 1], weight=1)
+
         self.update_detail_window(self.detail_target, False)
 
     def update_detail_window(self, target, from_search):
         if self.detail_window is None or not self.detail_window.winfo_exists(): return
+        # The simulation may not have published the core yet; the viewer is updated as soon as it has
+        if o.state_data.snapshot is None: return
 
         if not from_search:
             self.search_value.set("")
@@ -699,45 +821,51 @@ class App():
             self.update_detail_window(target % o.match_options["field_size"], from_search)
             return
 
-        for i in range(len(o.state_data)):
-            o.state_data[i].highlighted = False
+        o.state_data.clear_highlights()
         
         self.detail_target = target
         for i in range(len(self.info_labels)):
             target = (self.detail_target + i) % o.match_options["field_size"]
-            self.info_labels[i].configure(text=f" #{str(target).zfill(4 if o.match_options["field_size"] < 10000 else 5)}: {o.parse_instruction_to_text(o.state_data[target].instruction)}{' [*]' if o.state_data[target].read_marked else ''}")
-            self.info_labels[i].configure(text_color=o.get_tile_hex_color(o.state_data[target].color) if o.state_data[target].color != "black" else "white")
+            target_color = o.get_tile_color_from_code(o.state_data.get_color(target))
+            self.info_labels[i].configure(text=f" #{str(target).zfill(4 if o.match_options["field_size"] < 10000 else 5)}: {o.parse_instruction_to_text(o.state_data.get_instruction(target))}{' [*]' if o.state_data.read_marked[target] else ''}{' [W]' if target in o.write_watches else ''}{' [X]' if target in o.execute_watches else ''}")
+            self.info_labels[i].configure(text_color=o.get_tile_hex_color(target_color) if target_color != "black" else "white")
             self.info_labels[i].configure(font=("Consolas", 15), anchor="w")
-            o.state_data[target].highlighted = True
+            o.state_data.highlight(target)
 
-        # Buttons need to be locked to prevent the insane race condition that I cannot trace
-        th.Thread(target=self.lock_detail_buttons).start()
-        o.update_requested = True
+        for checkbox, watched in ((self.write_watch_box, o.write_watches), (self.execute_watch_box, o.execute_watches)):
+            if self.detail_target in watched: checkbox.select()
+            else: checkbox.deselect()
 
-    def lock_detail_buttons(self):
-        self.up_one_button.configure(state=ctk.DISABLED, width=35)
-        self.up_ten_button.configure(state=ctk.DISABLED, width=35)
-        self.down_one_button.configure(state=ctk.DISABLED, width=35)
-        self.down_ten_button.configure(state=ctk.DISABLED, width=35)
-        sleep(0.01)
-        self.up_one_button.configure(state=ctk.NORMAL, width=30)
-        self.up_ten_button.configure(state=ctk.NORMAL, width=30)
-        self.down_one_button.configure(state=ctk.NORMAL, width=30)
-        self.down_ten_button.configure(state=ctk.NORMAL, width=30)
-
-    def deghost(self):
-        # Janky fix for ghost highlights problem on slower systems
-        # This simply forces a core redraw from scratch
-        for i in range(len(o.state_data)):
-            o.state_data[i].highlighted = False
-        o.prev_state_data = []
         o.update_requested = True
+
+    def toggle_watch(self, watched, message, checkbox):
+        # Starts or stops watching the address at the top of the detail viewer; the simulation keeps its watches until a new match is set up
+        on = checkbox.get() == 1
+        if on: watched.add(self.detail_target)
+        else: watched.discard(self.detail_target)
+        o.send(message, self.detail_target, on)
         self.update_detail_window(self.detail_target, False)
 
+    def set_process_threshold(self, threshold):
+        # Breaks whenever a warrior's process count reaches the threshold, or drops back under it; clearing the entry removes it
+        if threshold == "":
+            threshold = None
+        else:
+            try: threshold = int(threshold)
+            except ValueError: return
+
+        o.process_threshold = threshold
+        o.send("watch_processes", threshold)
+
+    def show_watch_hit(self, location):
+        # The simulation has already paused itself on the hit; the controls follow, and the detail viewer is opened onto the address
+        if not o.paused: self.toggle_pause()
+        if self.state_window is None or not self.state_window.winfo_exists(): self.open_state_window()
+        if self.detail_window is None or not self.detail_window.winfo_exists(): self.open_detail_window()
+        self.update_detail_window(location, False)
+
     def close_detail_win(self):
-        for i in range(len(o.state_data)):
-            o.state_data[i].highlighted = False
-        o.prev_state_data = []
+        o.state_data.clear_highlights()
         o.update_requested = True
         try: self.detail_button.configure(state=ctk.NORMAL, text="Open Detail Viewer")
         except: pass
@@ -745,14 +873,27 @@ class App():
 
     def update_core_label(self):
         # Create text to be displayed on the root core readout
-        if self.core_label is None or o.state_data == []: return
+        if self.core_label is None or o.state_data is None: return
+
+        state = o.state_data.snapshot
+        if state is None: return
+
+        # Warriors are published in the order they were entered, with their results alongside
+        alive = [i for i in range(len(o.entrants)) if state.alive[i]]
 
         core_text = ""
-        core_text += f"Cycle {o.cur_cycle:0{len(str(o.match_options["max_cycle_count"]))}}/{o.match_options["max_cycle_count"]}\n"
-        if not o.sim_completed:
-            core_text += f"Warriors Remaining: {len(o.warriors_temp)}"
-        elif len(o.warriors_temp) == 1:
-            core_text += f"Winner: {o.warriors_temp[0].name} ({o.warriors_temp[0].color})"
+        if o.match_options["rounds"] > 1:
+            core_text += f"Round {state.round_index + 1}/{o.match_options["rounds"]}\n"
+        core_text += f"Cycle {state.cycle:0{len(str(state.max_cycles))}}/{state.max_cycles}\n"
+        if not state.completed:
+            core_text += f"Warriors Remaining: {len(alive)}\n"
+            core_text += "Territory: " + ", ".join(f"{o.entrants[i].name} {state.territory[i] / state.size:.1%}" for i in alive)
+            if not o.paused: core_text += f"\nSpeed: {state.speed} cycles/s"
+        elif o.match_options["rounds"] > 1:
+            # Summarise the rounds won by each warrior
+            core_text += "Wins: " + ", ".join(f"{warrior.name} {state.wins[i]}" for i, warrior in enumerate(o.entrants)) + f", Draws: {state.draws}"
+        elif len(alive) == 1:
+            core_text += f"Winner: {o.entrants[alive[0]].name} ({o.entrants[alive[0]].color})"
         else:
             core_text += "Draw"
         
@@ -773,7 +914,6 @@ class App():
         credits_text += "Libraries used: customtkinter, PIL, pyperclip & dependencies\n"
         credits_text += "Probably dedicated to someone, IDK"
 
-        self.deghost_toggle = ctk.CTkCheckBox(self.options_window, command=o.toggle_deghost, text="Show 'redraw core' button\n(use in case of ghost highlights)")
         self.theme_settings_container = ctk.CTkFrame(self.options_window)
         self.credits_button = ctk.CTkButton(self.options_window, command=lambda: showinfo(title="Tailwind Redcode Simulator: Credits", message=credits_text), text="Credits")
 
@@ -781,15 +921,14 @@ class App():
         self.theme_selector = ctk.CTkOptionMenu(self.theme_settings_container, command=o.set_theme)
         self.dark_mode_toggle = ctk.CTkCheckBox(self.theme_settings_container, command=o.toggle_dark_mode, text="Dark Mode")
 
-        self.deghost_toggle.grid(row=0, column=0, sticky="ew")
-        self.theme_settings_container.grid(row=1, column=0, sticky="nsew")
-        self.credits_button.grid(row=3, column=0, sticky="ns")
+        self.theme_settings_container.grid(row=0, column=0, sticky="nsew")
+        self.credits_button.grid(row=2, column=0, sticky="ns")
 
         self.theme_label.grid(row=0, column=0, sticky="ew")
         self.theme_selector.grid(row=1, column=0, sticky="nsew")
         self.dark_mode_toggle.grid(row=2, column=0, sticky="ew")
 
-        self.options_window.grid_rowconfigure(list(range(4)), weight=1)
+        self.options_window.grid_rowconfigure(list(range(3)), weight=1)
         self.options_window.grid_columnconfigure(0, weight=1)
 
         self.theme_settings_container.grid_rowconfigure(list(range(3)), weight=1)
@@ -797,7 +936,6 @@ class App():
 
         # Set options as needed
         if ctk.get_appearance_mode() == "Dark": self.dark_mode_toggle.select()
-        if o.deghost_button_enabled: self.deghost_toggle.select()
 
         # Configure the theme selector
         # Get all themes in assets/themes excluding the hardcoded default and the template
@@ -830,7 +968,6 @@ class App():
                     ctk.set_appearance_mode("dark")
                 else:
                     ctk.set_appearance_mode("light")
-                o.deghost_button_enabled = o.user_config["deghost_button_enabled"]
                 ctk.set_default_color_theme(f"assets/themes/{o.user_config['selected_theme']}.json")
 
         except FileNotFoundError:
@@ -838,13 +975,19 @@ class App():
             ctk.set_appearance_mode("system")
             ctk.set_default_color_theme("assets/themes/tailwind_blue.json")
             o.user_config["dark_mode_enabled"] = ctk.get_appearance_mode() == "Dark"
-            o.user_config["deghost_button_enabled"] = False
             o.user_config["selected_theme"] = "tailwind_blue"
             self.save_user_config()
         
         # Set the root window's icon to the loaded theme
         o.root.iconbitmap(f"assets/icons/icon_{o.user_config['selected_theme']}.ico")
 
-main = App()
-print("Tailwind loaded successfully.")
-o.root.mainloop()
+if __name__ == "__main__":
+    o.root = ctk.CTk()
+    o.root.geometry("450x200")
+    o.root.resizable(False, False)
+    o.root.title("Tailwind v1.0")
+    o.root.protocol("WM_DELETE_WINDOW", o.close_all_threads)
+
+    main = App()
+    print("Tailwind loaded successfully.")
+    o.root.mainloop()
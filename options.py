@@ -2,9 +2,12 @@
 # It also manages the inner workings of the setup and options menus
 
 import customtkinter as ctk
+import multiprocessing as mp
 from enum import Enum
-from random import randint
-from copy import deepcopy
+from core import Instruction, Warrior, CROSS, addressing_modes, modifiers, opcodes, parse_instruction_to_text
+from recording import TraceReader
+from shared import CoreView, SharedCore
+import process
 
 class tile_colors(Enum):
     blue = (0, 200, 200)
@@ -30,70 +33,13 @@ def get_tile_color_from_id(id : int, cross : bool = False):
     if cross: color = "cross_" + color
     return color
 
-# The below lists are compiled from ICWS 94: https://corewar.co.uk/standards/icws94.htm
-addressing_modes = [
-    "#", "$", "*", "@", "{", "<", "}", ">"
-]
-
-modifiers = [
-    "A", "B", "AB", "BA", "F", "X", "I"
-]
-
-opcodes = [
-    "DAT", "MOV", "ADD", "SUB", "MUL", "DIV", "MOD", "JMP", "JMZ", "JMN", "DJN", "SPL", "CMP", "SEQ", "SNE", "SLT", "LDP", "STP", "NOP"
-]
-
-class Instruction:
-    def __init__(self, opcode : str, modifier : str, a_mode_1 : str, address_1, a_mode_2 : str, address_2):
-        self.opcode = opcode
-        self.modifier = modifier
-        self.a_mode_1 = a_mode_1
-        self.address_1 = address_1
-        self.a_mode_2 = a_mode_2
-        self.address_2 = address_2
-
-    # Necessary to allow comparisons between instances by attributes
-    def __eq__(self, other):
-        c1 = self.opcode == other.opcode and self.modifier == other.modifier and self.a_mode_1 == other.a_mode_1
-        c2 = self.address_1 == other.address_1 and self.a_mode_2 == other.a_mode_2 and self.address_2 == other.address_2
-        return c1 and c2
-
-class Warrior:
-    def __init__(self, name : str, id : int, color : str, raw_data : list, load_file : list, asserts : list):
-        self.name = name
-        self.id = id
-        self.color = color
-        self.raw_data = raw_data
-        self.load_file = load_file
-        self.asserts = asserts
-
-class Process:
-    def __init__(self, location : int, warrior : int):
-        self.location = location
-        self.warrior = warrior
-        self.dying = False
-
-class Tile:
-    def __init__(self, warrior : int, color : str, instruction : Instruction, read_marked : bool, highlighted : bool):
-        self.warrior = warrior
-        self.color = color
-        self.instruction = instruction
-        self.read_marked = read_marked
-        self.highlighted = highlighted
-
-    # See Instruction
-    def __eq__(self, other):
-        c1 = self.warrior == other.warrior and self.color == other.color and self.instruction == other.instruction
-        c2 = self.read_marked == other.read_marked and self.highlighted == other.highlighted
-        return c1 and c2
-    
-    def __ne__(self, other):
-        c1 = self.warrior != other.warrior or self.color != other.color or self.instruction != other.instruction
-        c2 = self.read_marked != other.read_marked or self.highlighted != other.highlighted
-        return c1 or c2
-
-# This is declared here, so it can be accessed by other files
-root = ctk.CTk()
+# Converts a colour as stored in the core to a tile colour name
+def get_tile_color_from_code(code : int):
+    if code & ~CROSS == 0: return "black"
+    return get_tile_color_from_id((code & ~CROSS) - 1, bool(code & CROSS))
+
+# This is declared here, so it can be accessed by other files; main.py creates it, as the simulation process must not
+root = None
 
 user_config = {}
 
@@ -102,16 +48,32 @@ paused = True
 match_options = {
     "field_size": 8000,
     "max_cycle_count": 80000,
-    "max_program_length": 100
+    "max_program_length": 100,
+    "max_processes": 8000,
+    "rounds": 1,
+    "seed": None,
+    "min_distance": 0
 }
 
 warriors = []
 warriors_temp = []
 
-state_data = []
-prev_state_data = []
-cur_cycle = 0
-process_queue = []
+# The simulation process, the UI's end of the pipe controlling it, and the shared memory it publishes the core into
+simulation = None
+connection = None
+shared_core = None
+# Warriors of the running match, in the order the simulation publishes them
+entrants = []
+# View of the latest core the simulation has published
+state_data = None
+# First and last cycle of the recorded match being replayed, or None while a match is being played
+replay_cycles = None
+# Watchpoints set on the match, as sent to the simulation: addresses to break on writes to and execution of, and the process count to break at
+write_watches = set()
+execute_watches = set()
+process_threshold = None
+# Watchpoint hits already shown
+watch_hits = 0
 
 state_image = None
 resized_state_image = None
@@ -121,55 +83,90 @@ program_closing = False
 
 speed_levels = [1, 5, 10, 50, 100, 250, 500, 1000, 2000, 5000]
 max_speed_enabled = False
-deghost_button_enabled = False
+
+def start_simulation():
+    global simulation, connection
+
+    connection, simulation_connection = mp.Pipe()
+    simulation = mp.Process(target=process.simulation_process, args=(simulation_connection,), daemon=True)
+    simulation.start()
+
+def send(*message):
+    # Sends a command to the simulation process; see Simulation.handle
+    connection.send(message)
+
+def create_shared_core(new_entrants : list):
+    global shared_core, entrants, state_data, sim_completed, process_threshold, watch_hits
+
+    # Each match gets its own shared memory, sized for its core and warriors; the simulation stops using the old one when it sets up the new match
+    if shared_core is not None: shared_core.close(True)
+    entrants = new_entrants
+    shared_core = SharedCore(match_options["field_size"], len(entrants), max(warrior.id for warrior in entrants) + 2)
+    state_data = CoreView(match_options["field_size"])
+    sim_completed = False
+    # Watchpoints belong to the match they were set on
+    write_watches.clear()
+    execute_watches.clear()
+    process_threshold = None
+    watch_hits = 0
 
 def initialize_core():
-    global state_data, process_queue, prev_state_data, cur_cycle
-
-    # Initialize a new core with all warriors and parameters
-    state_data = [Tile(None, "black", Instruction("DAT", "F", "$", 0, "$", 0), False, False) for i in range(match_options["field_size"])]
-    process_queue = []
-    prev_state_data = []
-    cur_cycle = 0
-
-    # Place warriors at random positions
-    for warrior in deepcopy(warriors):
-        while True:
-            warrior_pos = randint(0, len(state_data) - 1)
-
-            # Check for the presence of other warriors in the covered range
-            blocked = False
-            for i in range(warrior_pos, warrior_pos + match_options["max_program_length"]):
-                if state_data[i % match_options["field_size"]].warrior is not None:
-                    blocked = True
-            
-            # Simple brute-force; reattempt placement if blocking warrior is found
-            if not blocked: break
-
-        # Once placement is found, place warrior
-        i = warrior_pos
-        for line in warrior.load_file:
-            state_data[i % match_options["field_size"]] = Tile(None, "cross_" + warrior.color, line, False, False)
-            i += 1
-
-        # Add warrior's process queue to main queue
-        process_queue.append([Process(warrior_pos, warrior.id)])
-
-    # All negative numbers in the core are converted to equivalent positives, as ICWS 94 requires
-    for tile in state_data:
-        if tile.instruction.address_1 < 0:
-            tile.instruction.address_1 = match_options["field_size"] - (tile.instruction.address_1 * -1)
-        if tile.instruction.address_2 < 0:
-            tile.instruction.address_2 = match_options["field_size"] - (tile.instruction.address_2 * -1)
-
-def parse_instruction_to_text(instruction : Instruction):
-    return f"{instruction.opcode}.{instruction.modifier} {instruction.a_mode_1}{instruction.address_1}, {instruction.a_mode_2}{instruction.address_2}"
+    global replay_cycles
+
+    replay_cycles = None
+    create_shared_core(warriors)
+
+    # Initialize a new match with all warriors and parameters; later rounds are set up by the simulation itself
+    send("setup", entrants, match_options, shared_core.name)
+    send("speed", play_speed, max_speed_enabled)
+
+def open_trace(path : str):
+    # Replays a recorded match in place of a new one; raises ValueError if the file is not a finished trace
+    global replay_cycles
+
+    # Only the trace's metadata is needed here; the simulation opens it again to play it
+    reader = TraceReader(path)
+    match_options["field_size"] = reader.field_size
+    match_options["max_cycle_count"] = reader.max_cycles
+    match_options["rounds"] = 1
+    replay_cycles = (reader.start_cycle, reader.end_cycle)
+    recorded_entrants = reader.get_entrants()
+    reader.close()
+
+    create_shared_core(recorded_entrants)
+    send("replay", path, shared_core.name)
+    send("speed", play_speed, max_speed_enabled)
+
+def refresh_state():
+    # Takes the latest core the simulation has published, if it is newer than the one shown; returns whether it was
+    global update_requested, sim_completed
+
+    if shared_core is None: return False
+    snapshot = shared_core.read()
+    if snapshot is None or (state_data.snapshot is not None and snapshot.sequence == state_data.snapshot.sequence): return False
+
+    state_data.update(snapshot)
+    sim_completed = bool(snapshot.completed)
+    update_requested = True
+    return True
+
+def take_watch_hit():
+    # Returns the address of the latest watchpoint hit, if the simulation has reported one since the last call
+    global watch_hits
+
+    snapshot = state_data.snapshot
+    if snapshot is None or snapshot.watch_hits == watch_hits: return None
+    watch_hits = snapshot.watch_hits
+    return snapshot.watch_location
 
 def close_all_threads():
     global program_closing
 
     # For terminating all active processes on program exit
     program_closing = True
+    send("close")
+    simulation.join(1)
+    if shared_core is not None: shared_core.close(True)
     root.destroy()
 
 # Options menu
@@ -181,11 +178,5 @@ def toggle_dark_mode():
     else:
         user_config["dark_mode_enabled"] = False
 
-def toggle_deghost():
-    global deghost_button_enabled
-
-    deghost_button_enabled = not deghost_button_enabled
-    user_config["deghost_button_enabled"] = deghost_button_enabled
-
 def set_theme(theme : str):
     user_config["selected_theme"] = theme
\ No newline at end of file
@@ -1,447 +1,250 @@
 # This file handles the underlying simulation part of the program
+# The simulation runs in its own process, so it never competes with the UI for the GIL; the UI controls it through a pipe,
+# and it publishes the core into shared memory, which the UI reads whenever it redraws
+# Nothing here imports the UI, as the process has to be started without it
+
+from time import perf_counter, sleep
+from engine import Match
+from recording import Replay, TraceReader
+from shared import SharedCore
+from watches import Watches
+
+# The clock works in frames matching the render loop; cycles are run until each frame's time budget is spent
+frame_time = 0.05
+# Cycles are run in batches of roughly this fraction of a frame, so the deadline is checked without stepping one cycle at a time
+batch_time = 0.1
+# Period over which the achieved speed is measured
+measure_time = 0.5
+# Cycles of a match which can be stepped back through; the journal's memory grows with this, but stays bounded
+journal_cycles = 1000
+
+class Simulation:
+    def __init__(self):
+        self.match = None
+        self.shared = None
+        self.rounds = 1
+        # Rounds won by each entrant, and rounds drawn
+        self.wins = []
+        self.draws = 0
+        self.completed = False
+        # Cycle a replay has been asked to jump to; only the latest request is acted on, so dragging through a replay does not queue up seeks
+        self.seek_target = None
+        # Watchpoints set on the match; only matches are watched, as replays are not played through the engine
+        self.watches = None
+        # Watchpoint hits so far, and the address of the latest; the UI tells a new hit from the count going up
+        self.watch_hits = 0
+        self.watch_location = 0
+
+        self.running = False
+        self.play_speed = 1
+        self.max_speed = False
+
+        # Cycles per second the engine manages when running flat out; used to size batches
+        self.throughput = 10000.0
+        self.measured_speed = 0
+        self.restart_clock()
+
+    def restart_clock(self):
+        self.owed_cycles = 0.0
+        self.last_frame = perf_counter()
+        self.window_start = self.last_frame
+        self.window_cycles = 0
+
+    def handle(self, message : tuple):
+        # Applies a command sent by the UI; returns False once the process should exit
+        match message:
+            case ("setup", warriors, options, shared_name):
+                match = Match(warriors, options["field_size"], options["max_cycle_count"], options["max_program_length"], options["max_processes"], options["seed"], 0, options["min_distance"])
+                match.keep_journal(journal_cycles)
+                self.load(match, options["rounds"], shared_name)
+            case ("replay", path, shared_name):
+                # Recorded matches are played back in place of a match, and can be stepped and sought through
+                self.load(Replay(TraceReader(path)), 1, shared_name)
+            case ("seek", cycle):
+                if isinstance(self.match, Replay): self.seek_target = cycle
+            case ("run",):
+                self.running = self.match is not None and not self.completed
+                self.restart_clock()
+            case ("pause",):
+                self.running = False
+                # Speed is only shown while running
+                self.publish()
+            case ("step",):
+                # Advance button only executes one cycle
+                if self.match is not None and not self.completed:
+                    self.match.core.clear_read_marks()
+                    self.run_cycles(1)
+                    self.publish()
+            case ("step_back",):
+                if isinstance(self.match, Replay):
+                    # Replays can already go back to any cycle
+                    self.seek_target = self.match.cycle - 1
+                elif self.match is not None:
+                    self.step_back()
+            case ("watch_writes", location, on):
+                self.watches.watch_writes(location, on)
+                self.update_watches()
+            case ("watch_execution", location, on):
+                self.watches.watch_execution(location, None, on)
+                self.update_watches()
+            case ("watch_processes", threshold):
+                self.watches.watch_processes(threshold)
+                self.update_watches()
+            case ("speed", play_speed, max_speed):
+                self.play_speed = play_speed
+                self.max_speed = max_speed
+            case ("close",):
+                self.unload()
+                return False
+
+        return True
+
+    def load(self, match, rounds : int, shared_name : str):
+        self.unload()
+        self.match = match
+        self.shared = SharedCore(match.field_size, len(match.entrants), match.core.warrior_count + 1, shared_name)
+        self.rounds = rounds
+        self.wins = [0] * len(match.entrants)
+        self.draws = 0
+        self.completed = False
+        self.running = False
+        self.seek_target = None
+        self.watches = Watches(match.field_size)
+        self.watch_hits = 0
+        self.publish()
+
+    def update_watches(self):
+        # The match only takes the slower path while any watch is set
+        if not isinstance(self.match, Replay): self.match.watch(self.watches if self.watches else None)
+
+    def unload(self):
+        if self.shared is not None: self.shared.close()
+        if isinstance(self.match, Replay): self.match.reader.close()
+
+    def seek(self):
+        # Jumps a replay to the requested cycle; a replay which had finished can be played again from there
+        self.match.core.clear_read_marks()
+        self.match.seek(self.seek_target)
+        self.seek_target = None
+        self.wins = [0] * len(self.match.entrants)
+        self.draws = 0
+        self.completed = False
+        self.publish()
+
+    def step_back(self):
+        # Undoes the latest cycle, if it is still journaled; a match which had ended goes back to being played, and its round is no longer counted
+        match = self.match
+        result = match.result()
+        match.core.clear_read_marks()
+        if match.step_back(1) == 0: return
+
+        if result.completed:
+            self.tally(result, -1)
+            self.completed = False
+        self.publish()
+
+    def tally(self, result, count : int = 1):
+        # Adds the given amount of rounds to the winner of a round, or to the draws
+        if result.winner is None:
+            self.draws += count
+        else:
+            self.wins[[warrior.id for warrior in self.match.entrants].index(result.winner)] += count
+
+    def run_frame(self):
+        # Runs as many cycles as one frame allows at the current speed, then sleeps for the rest of it
+        frame_start = perf_counter()
+        deadline = frame_start + frame_time
+
+        if self.max_speed:
+            self.owed_cycles = float("inf")
+        else:
+            # Cycles are owed at the play speed, carrying fractions between frames
+            # The backlog is capped to one frame, so a slow frame does not cause a burst afterwards
+            self.owed_cycles = min(self.owed_cycles + self.play_speed * (frame_start - self.last_frame), max(self.play_speed * frame_time, 1))
+        self.last_frame = frame_start
+
+        if self.owed_cycles >= 1:
+            self.match.core.clear_read_marks()
+
+        executed = 0
+        while self.owed_cycles >= 1 and self.running and not self.completed and perf_counter() < deadline:
+            batch = int(min(self.owed_cycles, max(1, self.throughput * frame_time * batch_time)))
+            batch_start = perf_counter()
+            ran = self.run_cycles(batch)
+            batch_elapsed = perf_counter() - batch_start
+
+            if ran == batch and batch_elapsed > 0:
+                # Smoothed, so a single slow batch does not shrink the next ones too much
+                self.throughput = 0.8 * self.throughput + 0.2 * ran / batch_elapsed
+
+            executed += ran
+            self.owed_cycles -= ran
+            if ran < batch: break
+
+        self.window_cycles += executed
+        now = perf_counter()
+        if now - self.window_start >= measure_time:
+            self.measured_speed = self.window_cycles / (now - self.window_start)
+            self.window_start = now
+            self.window_cycles = 0
+
+        if executed > 0 or self.completed:
+            self.publish()
+
+        if self.completed:
+            self.running = False
+        elif now < deadline:
+            sleep(deadline - now)
+
+    def run_cycles(self, cycle_count : int):
+        # Runs up to the given amount of cycles, moving onto the next round whenever one ends; returns the amount executed
+        match = self.match
+        # Read markers are only displayed when the simulation is not running at max speed
+        match.mark_reads = not self.max_speed
+
+        start_cycle = match.cycle
+        result = match.step(cycle_count)
+        executed = match.cycle - start_cycle
+
+        if not isinstance(match, Replay) and match.watches is not None and match.watches.hit is not None:
+            # The match stopped at the end of the cycle a watch was hit in, and stays paused there
+            self.running = False
+            self.watch_hits += 1
+            self.watch_location = match.watches.take_hit().location
+
+        if result.completed:
+            self.tally(result)
+
+            if sum(self.wins) + self.draws < self.rounds:
+                match.reset(match.round_index + 1)
+            else:
+                self.completed = True
+
+        return executed
+
+    def publish(self):
+        match = self.match
+        values = {
+            "cycle": match.cycle,
+            "max_cycles": match.max_cycles,
+            "round_index": match.round_index,
+            "completed": self.completed,
+            "speed": round(self.measured_speed) if self.running else 0,
+            "draws": self.draws,
+            "watch_hits": self.watch_hits,
+            "watch_location": self.watch_location
+        }
+        self.shared.publish(match, values, self.wins)
+
+def simulation_process(connection):
+    # Entry point of the simulation process; commands are handled between frames, and while paused it blocks on the pipe rather than polling
+    simulation = Simulation()
 
-import options as o
-import math
-from time import sleep
-from copy import copy
-
-def simulation_clock(single_step : bool = False):
-    # Executes every interval given by play speed; triggers match turn calculations
     while True:
-        cycle_count = 1
-
-        if not single_step:
-            # Simulation is running normally
-            if o.max_speed_enabled:
-                # Immediately run the entire simulation
-                cycle_count = o.match_options["max_cycle_count"] - o.cur_cycle
-                sleep(1)
-            elif o.play_speed < 2:
-                sleep(1 / o.play_speed)
-            else:
-                # Above 5x speed, multiple instructions are run at once to decrease rendering demand
-                cycle_count = math.ceil(o.play_speed / 2)
-                sleep(0.5)
-                
-            if o.program_closing: break
-            if o.paused or o.sim_completed: continue
-
-        if o.cur_cycle + cycle_count > o.match_options["max_cycle_count"]:
-            cycle_count = o.match_options["max_cycle_count"] - o.cur_cycle
-
-        # Reset all read highlights in state data
-        for i in range(len(o.state_data)):
-            o.state_data[i].read_marked = False
-
-        for k in range(cycle_count):
-            if o.sim_completed: break
-
-            # Execute instructions as required; each warrior executes one
-            for i in range(len(o.process_queue)):
-                try:
-                    o.state_data, o.process_queue[i] = execute_process(o.process_queue[i], o.state_data)
-
-                    if o.process_queue[i] == []:
-                        # Warrior has no remaining processes and is eliminated
-                        o.warriors_temp.pop(i)
-                        o.process_queue.pop(i)
-                        for tile in o.state_data:
-                            if tile.warrior != i: continue
-                            tile.color = "cross_" + tile.color.removeprefix("cross_")
-
-                        # Only one warrior remains, and is the winner
-                        if len(o.warriors_temp) == 1:
-                            o.sim_completed = True
-                
-                # Since it is not possible to change the range of an active for loop, simply ignore the excess
-                except IndexError: continue
-
-            o.cur_cycle += 1
-
-        o.update_requested = True
-
-        if o.cur_cycle >= o.match_options["max_cycle_count"]:
-            # End the simulation
-            o.sim_completed = True
-
-        if single_step:
-            # Advance button only executes one cycle
-            break
-
-def execute_process(queue : list, state : list):
-    # The main execution function
-
-    process = queue.pop(0)
-
-    if state[process.location].instruction.opcode != "DAT" or state[process.location].warrior is None:
-        # Apply read marker to the currently targeted instruction
-        state[process.location].warrior = process.warrior
-        state[process.location].color = o.get_tile_color_from_id(process.warrior)
-        
-    # Add read highlight to new process location unless max speed is enabled
-    if not o.max_speed_enabled: state[process.location].read_marked = True
-
-    state, new_processes = evaluate_instruction(state, state[process.location].instruction, process)
-
-    # Add the updated processes back to the queue unless they has been killed
-    for new_process in new_processes:
-        if new_process.dying: continue
-        queue.append(new_process)
-
-    return state, queue
-
-def evaluate_instruction(state : list, instruction : o.Instruction, cur_process : o.Process):
-    # The main execution function
-    location_1 = get_absolute_core_location(instruction.a_mode_1, instruction.address_1, cur_process.location)
-    location_2 = get_absolute_core_location(instruction.a_mode_2, instruction.address_2, cur_process.location)
-
-    # Stores the active process and any processes created during execution
-    new_processes = [cur_process]
-
-    match instruction.opcode:
-        case "MOV":
-            # Copies fields of the source (loc1) into fields of the target (loc2)
-            match instruction.modifier:
-                case "A":
-                    # A to A
-                    state[location_2].instruction.a_mode_1 = state[location_1].instruction.a_mode_1
-                    state[location_2].instruction.address_1 = state[location_1].instruction.address_1
-                case "B":
-                    # B to B
-                    state[location_2].instruction.a_mode_2 = state[location_1].instruction.a_mode_2
-                    state[location_2].instruction.address_2 = state[location_1].instruction.address_2
-                case "AB":
-                    # A to B
-                    state[location_2].instruction.a_mode_2 = state[location_1].instruction.a_mode_1
-                    state[location_2].instruction.address_2 = state[location_1].instruction.address_1
-                case "BA":
-                    # B to A
-                    state[location_2].instruction.a_mode_1 = state[location_1].instruction.a_mode_2
-                    state[location_2].instruction.address_1 = state[location_1].instruction.address_2
-                case "F":
-                    # A to A + B to B
-                    state[location_2].instruction.a_mode_1 = state[location_1].instruction.a_mode_1
-                    state[location_2].instruction.address_1 = state[location_1].instruction.address_1
-                    state[location_2].instruction.a_mode_2 = state[location_1].instruction.a_mode_2
-                    state[location_2].instruction.address_2 = state[location_1].instruction.address_2
-                case "X":
-                    # A to B + B to A
-                    state[location_2].instruction.a_mode_1 = state[location_1].instruction.a_mode_2
-                    state[location_2].instruction.address_1 = state[location_1].instruction.address_2
-                    state[location_2].instruction.a_mode_2 = state[location_1].instruction.a_mode_1
-                    state[location_2].instruction.address_2 = state[location_1].instruction.address_1
-                case "I":
-                    # Whole instruction
-                    state[location_2].instruction = copy(state[location_1].instruction)
-
-            if state[location_2].color != state[cur_process.location].color:
-                state[location_2].color = "cross_" + state[cur_process.location].color.removeprefix("cross_")
-
-        case "DAT":
-            # Kills the current process
-            cur_process.dying = True
-            return state, new_processes
-
-        case "ADD":
-            # Adds the number in the source to the address in the destination
-            # Note that for all math operations, the source is always the current instruction unless indirect addressing is used
-            match instruction.modifier:
-                case "A":
-                    state[location_2].instruction.address_1 += state[location_1].instruction.address_1
-                case "B":
-                    state[location_2].instruction.address_2 += state[location_1].instruction.address_2
-                case "AB":
-                    state[location_2].instruction.address_2 += state[location_1].instruction.address_1
-                case "BA":
-                    state[location_2].instruction.address_1 += state[location_1].instruction.address_2
-                case "F" | "I":
-                    state[location_2].instruction.address_1 += state[location_1].instruction.address_1
-                    state[location_2].instruction.address_2 += state[location_1].instruction.address_2
-                case "X":
-                    state[location_2].instruction.address_1 += state[location_1].instruction.address_2
-                    state[location_2].instruction.address_2 += state[location_1].instruction.address_1
-
-        case "SUB":
-            # Subtracts the number in the source from the address in the target
-            match instruction.modifier:
-                case "A":
-                    state[location_2].instruction.address_1 -= state[location_1].instruction.address_1
-                case "B":
-                    state[location_2].instruction.address_2 -= state[location_1].instruction.address_2
-                case "AB":
-                    state[location_2].instruction.address_2 -= state[location_1].instruction.address_1
-                case "BA":
-                    state[location_2].instruction.address_1 -= state[location_1].instruction.address_2
-                case "F" | "I":
-                    state[location_2].instruction.address_1 -= state[location_1].instruction.address_1
-                    state[location_2].instruction.address_2 -= state[location_1].instruction.address_2
-                case "X":
-                    state[location_2].instruction.address_1 -= state[location_1].instruction.address_2
-                    state[location_2].instruction.address_2 -= state[location_1].instruction.address_1
-
-        case "MUL":
-            # Multiplies the target by the source
-            match instruction.modifier:
-                case "A":
-                    state[location_2].instruction.address_1 *= state[location_1].instruction.address_1
-                case "B":
-                    state[location_2].instruction.address_2 *= state[location_1].instruction.address_2
-                case "AB":
-                    state[location_2].instruction.address_2 *= state[location_1].instruction.address_1
-                case "BA":
-                    state[location_2].instruction.address_1 *= state[location_1].instruction.address_2
-                case "F" | "I":
-                    state[location_2].instruction.address_1 *= state[location_1].instruction.address_1
-                    state[location_2].instruction.address_2 *= state[location_1].instruction.address_2
-                case "X":
-                    state[location_2].instruction.address_1 *= state[location_1].instruction.address_2
-                    state[location_2].instruction.address_2 *= state[location_1].instruction.address_1
-
-        case "DIV":
-            # Divides the target by the source
-            # Note that it is always integer division, and division by 0 kills the process
-            try:
-                match instruction.modifier:
-                    case "A":
-                        state[location_2].instruction.address_1 //= state[location_1].instruction.address_1
-                    case "B":
-                        state[location_2].instruction.address_2 //= state[location_1].instruction.address_2
-                    case "AB":
-                        state[location_2].instruction.address_2 //= state[location_1].instruction.address_1
-                    case "BA":
-                        state[location_2].instruction.address_1 //= state[location_1].instruction.address_2
-                    case "F" | "I":
-                        state[location_2].instruction.address_1 //= state[location_1].instruction.address_1
-                        state[location_2].instruction.address_2 //= state[location_1].instruction.address_2
-                    case "X":
-                        state[location_2].instruction.address_1 //= state[location_1].instruction.address_2
-                        state[location_2].instruction.address_2 //= state[location_1].instruction.address_1
-            except ZeroDivisionError:
-                cur_process.dying = True
-                return state, new_processes
-
-        case "MOD":
-            # Performs modulo operation using the target and the source
-            try:
-                match instruction.modifier:
-                    case "A":
-                        state[location_2].instruction.address_1 %= state[location_1].instruction.address_1
-                    case "B":
-                        state[location_2].instruction.address_2 %= state[location_1].instruction.address_2
-                    case "AB":
-                        state[location_2].instruction.address_2 %= state[location_1].instruction.address_1
-                    case "BA":
-                        state[location_2].instruction.address_1 %= state[location_1].instruction.address_2
-                    case "F" | "I":
-                        state[location_2].instruction.address_1 %= state[location_1].instruction.address_1
-                        state[location_2].instruction.address_2 %= state[location_1].instruction.address_2
-                    case "X":
-                        state[location_2].instruction.address_1 %= state[location_1].instruction.address_2
-                        state[location_2].instruction.address_2 %= state[location_1].instruction.address_1
-            except ZeroDivisionError:
-                cur_process.dying = True
-                return state, new_processes
-
-        case "JMP":
-            # Jumps to the A-field address
-            cur_process.location = location_1
-            return state, new_processes
-        
-        case "JMZ":
-            # Jumps to the A-field address only if the value of the target is 0
-            check_passed = False
-            match instruction.modifier:
-                case "A" | "AB":
-                    if state[location_2].instruction.address_1 == 0:
-                        check_passed = True
-                case "B" | "BA":
-                    if state[location_2].instruction.address_2 == 0:
-                        check_passed = True
-                case "F" | "X" | "I":
-                    if state[location_2].instruction.address_1 == 0 and state[location_2].instruction.address_2 == 0:
-                        check_passed = True
-            if check_passed:
-                cur_process.location = location_1
-                return state, new_processes
-            
-        case "JMN":
-            # Jumps if target is not 0; the opposite of JMZ
-            check_passed = False
-            match instruction.modifier:
-                case "A" | "AB":
-                    if state[location_2].instruction.address_1 != 0:
-                        check_passed = True
-                case "B" | "BA":
-                    if state[location_2].instruction.address_2 != 0:
-                        check_passed = True
-                case "F" | "X" | "I":
-                    if state[location_2].instruction.address_1 != 0 or state[location_2].instruction.address_2 != 0:
-                        check_passed = True
-            if check_passed:
-                cur_process.location = location_1
-                return state, new_processes
-
-        case "DJN":
-            # Identical to JMN except the target number is first decemented by 1
-            check_passed = False
-            match instruction.modifier:
-                case "A" | "AB":
-                    state[location_2].instruction.address_1 -= 1
-                    if state[location_2].instruction.address_1 != 0:
-                        check_passed = True
-                case "B" | "BA":
-                    state[location_2].instruction.address_2 -= 1
-                    if state[location_2].instruction.address_2 != 0:
-                        check_passed = True
-                case "F" | "X" | "I":
-                    state[location_2].instruction.address_1 -= 1
-                    state[location_2].instruction.address_2 -= 1
-                    if state[location_2].instruction.address_1 != 0 or state[location_2].instruction.address_2 != 0:
-                        check_passed = True
-            if check_passed:
-                cur_process.location = location_1
-                return state, new_processes
-
-        case "SPL":
-            # Creates a new process at the target location
-            new_processes.append(o.Process(location_1, cur_process.warrior))
-
-        case "SEQ" | "CMP":
-            # Compares the instructions at the A- and B-fields; skips the next instruction if they are equal
-            check_passed = False
-            match instruction.modifier:
-                case "A":
-                    if state[location_1].instruction.address_1 == state[location_2].instruction.address_1:
-                        check_passed = True
-                case "B":
-                    if state[location_1].instruction.address_2 == state[location_2].instruction.address_2:
-                        check_passed = True
-                case "AB":
-                    if state[location_1].instruction.address_1 == state[location_2].instruction.address_2:
-                        check_passed = True
-                case "BA":
-                    if state[location_1].instruction.address_2 == state[location_2].instruction.address_1:
-                        check_passed = True
-                case "F":
-                    if state[location_1].instruction.address_1 == state[location_2].instruction.address_1 and state[location_1].instruction.address_2 == state[location_2].instruction.address_2:
-                        check_passed = True
-                case "X":
-                    if state[location_1].instruction.address_1 == state[location_2].instruction.address_2 and state[location_1].instruction.address_2 == state[location_2].instruction.address_1:
-                        check_passed = True
-                case "I":
-                    if state[location_1].instruction == state[location_2].instruction:
-                        check_passed = True
-            if check_passed:
-                cur_process.location += 2
-                cur_process.location %= o.match_options["field_size"]
-                return state, new_processes
-
-        case "SNE":
-            # Inverse of SEQ/CMP; skips if compared instructions are not equal
-            check_passed = False
-            match instruction.modifier:
-                case "A":
-                    if state[location_1].instruction.address_1 != state[location_2].instruction.address_1:
-                        check_passed = True
-                case "B":
-                    if state[location_1].instruction.address_2 != state[location_2].instruction.address_2:
-                        check_passed = True
-                case "AB":
-                    if state[location_1].instruction.address_1 != state[location_2].instruction.address_2:
-                        check_passed = True
-                case "BA":
-                    if state[location_1].instruction.address_2 != state[location_2].instruction.address_1:
-                        check_passed = True
-                case "F":
-                    if state[location_1].instruction.address_1 != state[location_2].instruction.address_1 or state[location_1].instruction.address_2 != state[location_2].instruction.address_2:
-                        check_passed = True
-                case "X":
-                    if state[location_1].instruction.address_1 != state[location_2].instruction.address_2 or state[location_1].instruction.address_2 != state[location_2].instruction.address_1:
-                        check_passed = True
-                case "I":
-                    if state[location_1].instruction != state[location_2].instruction:
-                        check_passed = True
-            if check_passed:
-                cur_process.location += 2
-                cur_process.location %= o.match_options["field_size"]
-                return state, new_processes
-            
-        case "SLT":
-            # Performs SEQ/CMP/SNE skip if the source value is less than the target
-            check_passed = False
-            match instruction.modifier:
-                case "A":
-                    if state[location_1].instruction.address_1 < state[location_2].instruction.address_1:
-                        check_passed = True
-                case "B":
-                    if state[location_1].instruction.address_2 < state[location_2].instruction.address_2:
-                        check_passed = True
-                case "AB":
-                    if state[location_1].instruction.address_1 < state[location_2].instruction.address_2:
-                        check_passed = True
-                case "BA":
-                    if state[location_1].instruction.address_2 < state[location_2].instruction.address_1:
-                        check_passed = True
-                case "F" | "I":
-                    if state[location_1].instruction.address_1 < state[location_2].instruction.address_1 or state[location_1].instruction.address_2 < state[location_2].instruction.address_2:
-                        check_passed = True
-                case "X":
-                    if state[location_1].instruction.address_1 < state[location_2].instruction.address_2 or state[location_1].instruction.address_2 < state[location_2].instruction.address_1:
-                        check_passed = True
-            if check_passed:
-                cur_process.location += 2
-                cur_process.location %= o.match_options["field_size"]
-                return state, new_processes
-
-        case "NOP" | "_":
-            # No operation
-            pass
-
-    # Move the process forward one step
-    cur_process.location += 1
-    cur_process.location %= o.match_options["field_size"]
-        
-    return state, new_processes
-
-def get_absolute_core_location(mode : str, value : int, origin : int):
-    # Converts an addressing mode-value pair to an absolute value
-    next_location = (origin + value) % o.match_options["field_size"]
-
-    match mode:
-        case "#":
-            # Immediate addressing always evaluates to $0
-            return origin
-        case "$":
-            # Relative
-            return next_location
-        case "*":
-            # A-field indirect
-            target = o.state_data[next_location].instruction.address_1
-            return get_absolute_core_location("$", target, next_location)
-        case "@":
-            # B-field indirect
-            target = o.state_data[next_location].instruction.address_2
-            return get_absolute_core_location("$", target, next_location)
-        case "{":
-            # Predecremented A-field indirect
-            target = o.state_data[next_location].instruction.address_1
-            o.state_data[next_location].instruction.address_1 -= 1
-            return get_absolute_core_location("$", target, next_location)
-        case "<":
-            # Predecremented B-field indirect
-            target = o.state_data[next_location].instruction.address_2
-            o.state_data[next_location].instruction.address_2 -= 1
-            return get_absolute_core_location("$", target, next_location)
-        case "}":
-            # Postincremented A-field indirect
-            target = o.state_data[next_location].instruction.address_1
-            value = get_absolute_core_location("$", target, next_location)
-            o.state_data[next_location].instruction.address_1 += 1
-            return value
-        case ">":
-            # Postincremented B-field indirect
-            target = o.state_data[next_location].instruction.address_2
-            value = get_absolute_core_location("$", target, next_location)
-            o.state_data[next_location].instruction.address_2 += 1
-            return value
-        
\ No newline at end of file
+        while connection.poll(0 if simulation.running or simulation.seek_target is not None else None):
+            if not simulation.handle(connection.recv()): return
+
+        if simulation.seek_target is not None:
+            simulation.seek()
+        if simulation.running:
+            simulation.run_frame()
@@ -0,0 +1,304 @@
+# This file records matches into compact binary traces, and plays them back without loading them into memory
+# A trace holds one record for every process executed: the warrior, the executed location,
+# how many successors the process left (0 if it died, 2 if it spawned one) and every tile it wrote
+# Between cycles, keyframes hold the full state of the match, compressed; the first is the state when recording started
+# Indexes of where each cycle's records and each keyframe start are written at the end, so a reader can go straight to any cycle
+
+import json
+import mmap
+import zlib
+from array import array
+from bisect import bisect_right
+from struct import Struct
+from core import Core, DAT, Warrior, fill_dense, get_template
+from engine import MatchResult
+
+MAGIC = b"TWTR"
+VERSION = 2
+
+# Magic, version and the length of the JSON metadata which follows
+header_record = Struct("<4sHI")
+# Cycle and compressed length of a keyframe
+keyframe_record = Struct("<QI")
+# Length of the JSON state at the start of a decompressed keyframe, which is followed by the core's arrays
+state_record = Struct("<I")
+# Warrior id, executed location, successors left, and the amount of tiles written
+process_record = Struct("<HIBB")
+# Location of a spawned process
+spawn_record = Struct("<I")
+# Location and every field of a written tile, widest first: address_1, address_2, color, opcode, modifier, a_mode_1, a_mode_2
+tile_record = Struct("<IIIHBBBB")
+# Offsets of the cycle and keyframe indexes, and the amounts of cycles and keyframes recorded
+footer_record = Struct("<QQQQ4s")
+
+# Arrays of the core in a keyframe, in the order they are stored; the widest come first, so every array is aligned
+core_arrays = [("address_1", "I"), ("address_2", "I"), ("owner", "H"), ("color", "H"), ("opcode", "B"), ("modifier", "B"), ("a_mode_1", "B"), ("a_mode_2", "B")]
+# Templates of the core arrays, used to write sparse cores out in full
+template_names = {"address_1": "address", "address_2": "address", "owner": "owner", "color": "owner", "opcode": "opcode", "modifier": "modifier", "a_mode_1": "mode", "a_mode_2": "mode"}
+
+class TraceWriter:
+    # Streams a match into a trace file; records are buffered, and only written out in bulk
+    # A keyframe is written every keyframe_interval cycles; seeking replays at most that many cycles, at the cost of a compressed core each time
+    def __init__(self, path : str, buffer_size : int = 1 << 20, keyframe_interval : int = 1000):
+        self.file = open(path, "wb")
+        self.buffer_size = buffer_size
+        self.keyframe_interval = keyframe_interval
+        self.buffer = bytearray()
+        # Bytes already written to the file
+        self.offset = 0
+        # Where each cycle's records start, with the end of the last one after them
+        self.index = array("Q")
+        # Cycle and offset of every keyframe
+        self.keyframe_cycles = array("Q")
+        self.keyframe_offsets = array("Q")
+        self.match = None
+        self.core = None
+
+    def start(self, match):
+        # Writes the trace's header, and the match's current state as its first keyframe
+        self.match = match
+        self.core = match.core
+        self.start_cycle = match.cycle
+        metadata = {
+            "field_size": match.field_size,
+            "max_cycles": match.max_cycles,
+            "max_processes": match.max_processes,
+            "seed": match.seed,
+            "round_index": match.round_index,
+            "start_cycle": match.cycle,
+            "entrants": [{"id": warrior.id, "name": warrior.name, "color": warrior.color} for warrior in match.entrants]
+        }
+        data = json.dumps(metadata).encode()
+        self.buffer += header_record.pack(MAGIC, VERSION, len(data)) + data
+
+        self.write_keyframe()
+        self.index.append(self.offset + len(self.buffer))
+        self.flush()
+
+    def write_keyframe(self):
+        # Appends the full state of the match: its core, and every living warrior's process queue
+        match = self.match
+        core = self.core
+        state = {
+            # Living warriors in the order they execute, and their queues
+            "warriors": [warrior.id for warrior in match.warriors],
+            "queues": [list(queue) for queue in match.queues],
+            "eliminated": [warrior_id for warrior_id in range(core.warrior_count) if core.eliminated[warrior_id + 1]],
+            "color_counts": core.color_counts
+        }
+        data = json.dumps(state).encode()
+        payload = bytearray(state_record.pack(len(data)) + data)
+        payload += bytes(-len(payload) % 8)
+
+        template = get_template(core.size)
+        for name, typecode in core_arrays:
+            field = getattr(core, name)
+            if core.sparse: field = fill_dense(template[template_names[name]][:], field)
+            payload += field
+
+        # Cores compress very well, and speed matters more than size here
+        payload = zlib.compress(payload, 1)
+        self.keyframe_cycles.append(match.cycle)
+        self.keyframe_offsets.append(self.offset + len(self.buffer))
+        self.buffer += keyframe_record.pack(match.cycle, len(payload)) + payload
+
+    def record_process(self, warrior_id : int, location : int, successors : int, queue, written : list):
+        # Records one executed process; written is the core's list of tiles written by it
+        buffer = self.buffer
+        core = self.core
+        # A tile is often written more than once by the same instruction, but only its final fields are needed
+        tiles = dict.fromkeys(written)
+
+        buffer += process_record.pack(warrior_id, location, successors, len(tiles))
+        if successors == 2: buffer += spawn_record.pack(queue[-1])
+        for tile in tiles:
+            buffer += tile_record.pack(tile, core.address_1[tile], core.address_2[tile], core.color[tile], core.opcode[tile], core.modifier[tile], core.a_mode_1[tile], core.a_mode_2[tile])
+
+    def end_cycle(self):
+        # A keyframe holds the state after its cycle, so it comes before the next cycle's records
+        if (self.match.cycle - self.start_cycle) % self.keyframe_interval == 0: self.write_keyframe()
+        self.index.append(self.offset + len(self.buffer))
+        if len(self.buffer) >= self.buffer_size: self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.offset += len(self.buffer)
+        self.buffer = bytearray()
+
+    def close(self):
+        # Finishes the trace with its indexes; a trace can only be read once it is closed
+        self.buffer += bytes(-(self.offset + len(self.buffer)) % 8)
+        index_offset = self.offset + len(self.buffer)
+        self.buffer += self.index
+        keyframe_index_offset = self.offset + len(self.buffer)
+        self.buffer += self.keyframe_cycles
+        self.buffer += self.keyframe_offsets
+        self.buffer += footer_record.pack(index_offset, len(self.index) - 1, keyframe_index_offset, len(self.keyframe_cycles), MAGIC)
+        self.flush()
+        self.file.close()
+
+class TraceReader:
+    # Reads a trace through a memory map, so only the parts which are looked at are ever loaded
+    def __init__(self, path : str):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, length = header_record.unpack_from(self.data, 0)
+        index_offset, self.cycle_count, keyframe_index_offset, keyframe_count, end_magic = footer_record.unpack_from(self.data, len(self.data) - footer_record.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError(f"{path} is not a finished Tailwind trace")
+        if version != VERSION:
+            raise ValueError(f"{path} is a version {version} trace; only version {VERSION} is supported")
+
+        self.metadata = json.loads(self.data[header_record.size:header_record.size + length])
+        self.field_size = self.metadata["field_size"]
+        self.max_cycles = self.metadata["max_cycles"]
+        self.round_index = self.metadata["round_index"]
+        self.start_cycle = self.metadata["start_cycle"]
+        self.end_cycle = self.start_cycle + self.cycle_count
+
+        # Views straight into the file, so the indexes are never loaded in full either
+        self.view = memoryview(self.data)
+        self.index = self.view[index_offset:index_offset + 8 * (self.cycle_count + 1)].cast("Q")
+        self.keyframe_cycles = self.view[keyframe_index_offset:keyframe_index_offset + 8 * keyframe_count].cast("Q")
+        self.keyframe_offsets = self.view[keyframe_index_offset + 8 * keyframe_count:keyframe_index_offset + 16 * keyframe_count].cast("Q")
+
+    def get_entrants(self):
+        # Stand-ins for the recorded warriors, with everything needed to display them
+        return [Warrior(entrant["name"], entrant["id"], entrant["color"], [], [], []) for entrant in self.metadata["entrants"]]
+
+    def get_warrior_count(self):
+        # As passed to Core by the recorded match
+        return max((entrant["id"] for entrant in self.metadata["entrants"]), default=-1) + 1
+
+    def find_keyframe(self, cycle : int):
+        # Index of the latest keyframe at or before the given cycle
+        return max(bisect_right(self.keyframe_cycles, cycle) - 1, 0)
+
+    def load_keyframe(self, index : int, core : Core):
+        # Puts the state of a keyframe into a dense core of the trace's size
+        # Returns its cycle, the ids of the living warriors in the order they execute, and their process queues
+        cycle, length = keyframe_record.unpack_from(self.data, self.keyframe_offsets[index])
+        start = self.keyframe_offsets[index] + keyframe_record.size
+        payload = memoryview(zlib.decompress(self.data[start:start + length]))
+
+        state_length = state_record.unpack_from(payload, 0)[0]
+        state = json.loads(bytes(payload[state_record.size:state_record.size + state_length]))
+        offset = state_record.size + state_length
+        offset += -offset % 8
+
+        core.reset()
+        for name, typecode in core_arrays:
+            size = array(typecode).itemsize * self.field_size
+            field = array(typecode)
+            field.frombytes(payload[offset:offset + size])
+            setattr(core, name, field)
+            offset += size
+
+        core.color_counts = state["color_counts"]
+        for warrior_id in state["eliminated"]:
+            core.eliminated[warrior_id + 1] = 1
+
+        return cycle, state["warriors"], state["queues"]
+
+    def get_processes(self, cycle : int):
+        # Yields every process executed in a cycle, as (warrior id, location, successors, spawned location, written tiles)
+        # Written tiles are tuples of the fields in tile_record's order
+        data = self.data
+        offset = self.index[cycle - self.start_cycle]
+        end = self.index[cycle - self.start_cycle + 1]
+
+        while offset < end:
+            warrior_id, location, successors, tile_count = process_record.unpack_from(data, offset)
+            offset += process_record.size
+
+            spawned = None
+            if successors == 2:
+                spawned = spawn_record.unpack_from(data, offset)[0]
+                offset += spawn_record.size
+
+            tiles = [tile_record.unpack_from(data, offset + i * tile_record.size) for i in range(tile_count)]
+            offset += tile_count * tile_record.size
+
+            yield warrior_id, location, successors, spawned, tiles
+
+    def close(self):
+        # Views have to be released before the memory map can be closed
+        for view in (self.index, self.keyframe_cycles, self.keyframe_offsets, self.view):
+            view.release()
+        self.data.close()
+        self.file.close()
+
+class Replay:
+    # Plays a trace back onto a core; it has the same attributes as a Match, so it can be displayed and stepped in its place
+    def __init__(self, reader : TraceReader):
+        self.reader = reader
+        self.field_size = reader.field_size
+        self.max_cycles = reader.max_cycles
+        self.round_index = reader.round_index
+        self.entrants = reader.get_entrants()
+        self.mark_reads = False
+
+        self.core = Core(reader.field_size, warrior_count=reader.get_warrior_count())
+        self.rewind()
+
+    def rewind(self):
+        # Goes back to the start of the trace
+        self.load_keyframe(0)
+
+    def load_keyframe(self, index : int):
+        self.cycle, warrior_ids, queues = self.reader.load_keyframe(index, self.core)
+        self.completed = self.cycle >= self.reader.end_cycle
+
+        entrants = {warrior.id: warrior for warrior in self.entrants}
+        self.warriors = [entrants[warrior_id] for warrior_id in warrior_ids]
+        self.processes = {warrior_id: len(queue) for warrior_id, queue in zip(warrior_ids, queues)}
+
+    def seek(self, cycle : int):
+        # Moves to the state after the given amount of cycles, within the recorded ones
+        # The nearest keyframe is loaded, unless the cycle is at most as far ahead as it, so only the cycles after it are replayed
+        cycle = max(self.reader.start_cycle, min(cycle, self.reader.end_cycle))
+        index = self.reader.find_keyframe(cycle)
+        if cycle < self.cycle or self.reader.keyframe_cycles[index] > self.cycle: self.load_keyframe(index)
+        self.step(cycle - self.cycle)
+
+    def step(self, cycles : int = 1):
+        # Plays up to the given amount of cycles, stopping at the end of the trace
+        core = self.core
+        for k in range(min(cycles, self.reader.end_cycle - self.cycle)):
+            for warrior_id, location, successors, spawned, tiles in self.reader.get_processes(self.cycle):
+                self.apply_process(core, warrior_id, location, successors, tiles)
+            self.cycle += 1
+
+        self.completed = self.cycle >= self.reader.end_cycle
+        return self.result()
+
+    def apply_process(self, core : Core, warrior_id : int, location : int, successors : int, tiles : list):
+        # Repeats what the engine did when executing the process, as in Match.execute_process
+        warrior = warrior_id + 1
+        if core.opcode[location] != DAT or core.owner[location] == 0:
+            core.owner[location] = warrior
+            if core.color[location] != warrior: core.set_color(location, warrior)
+
+        if self.mark_reads: core.mark_read(location)
+
+        for tile, address_1, address_2, color, opcode, modifier, a_mode_1, a_mode_2 in tiles:
+            core.set_fields(tile, (opcode, modifier, a_mode_1, address_1, a_mode_2, address_2))
+            if core.color[tile] != color: core.set_color(tile, color)
+
+        self.processes[warrior_id] += successors - 1
+        if self.processes[warrior_id] == 0:
+            # As in Match.eliminate
+            self.warriors = [warrior for warrior in self.warriors if warrior.id != warrior_id]
+            core.eliminated[warrior] = 1
+            core.mark_all_dirty()
+
+    def result(self):
+        return MatchResult(self.cycle, self.completed, [warrior.id for warrior in self.warriors])
+
+    def reset(self, round_index : int):
+        # A trace only holds one round, which is simply played again
+        self.rewind()
+
+    def territory(self, warrior_id : int):
+        return self.core.color_counts[warrior_id + 1] / self.field_size
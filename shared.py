@@ -0,0 +1,194 @@
+# This file lays out the core in shared memory, so the simulation process can publish it and the UI can read it without either waiting on the other
+# The writer makes the sequence counter odd while it writes and even again afterwards; readers copy the whole block,
+# and only accept the copy if the counter was the same even value before and after
+
+from array import array
+from multiprocessing import shared_memory
+from core import CROSS, Instruction, addressing_modes, modifiers, opcodes
+
+# Match values published with every core, each a signed 64-bit integer; the sequence counter is always first
+header_fields = ["sequence", "cycle", "max_cycles", "round_index", "completed", "speed", "draws", "watch_hits", "watch_location"]
+
+# Arrays published with every core, as (name, typecode, length in tiles or warriors)
+# They are ordered from the widest type down, so every array is aligned
+def get_layout(field_size : int, warrior_count : int, owner_count : int):
+    arrays = [
+        ("header", "q", len(header_fields)),
+        # Indexed by the warrior's position in the match's list of entrants
+        ("alive", "q", warrior_count),
+        ("territory", "q", warrior_count),
+        ("wins", "q", warrior_count),
+        ("address_1", "I", field_size),
+        ("address_2", "I", field_size),
+        ("owner", "H", field_size),
+        ("color", "H", field_size),
+        ("opcode", "B", field_size),
+        ("modifier", "B", field_size),
+        ("a_mode_1", "B", field_size),
+        ("a_mode_2", "B", field_size),
+        ("read_marked", "B", field_size),
+        # Indexed like ownership
+        ("eliminated", "B", owner_count)
+    ]
+
+    layout = {}
+    offset = 0
+    for name, typecode, length in arrays:
+        layout[name] = (offset, typecode, length)
+        offset += array(typecode).itemsize * length
+
+    return layout, offset
+
+def get_views(buffer, layout : dict):
+    # Typed views of every array in a block laid out as given
+    return {name: buffer[offset:offset + array(typecode).itemsize * length].cast(typecode) for name, (offset, typecode, length) in layout.items()}
+
+class SharedCore:
+    # A core published in shared memory; the UI creates it, and the simulation attaches to it by name
+    def __init__(self, field_size : int, warrior_count : int, owner_count : int, name : str = None):
+        self.field_size = field_size
+        self.layout, size = get_layout(field_size, warrior_count, owner_count)
+
+        self.memory = shared_memory.SharedMemory(name, create=name is None, size=size)
+        self.name = self.memory.name
+        self.views = get_views(self.memory.buf, self.layout)
+
+    def publish(self, match, values : dict, wins : list):
+        # Writes the match's core and the given header values; runs in the simulation process only
+        views = self.views
+        header = views["header"]
+        header[0] += 1
+
+        core = match.core
+        for name in ("address_1", "address_2", "owner", "color", "opcode", "modifier", "a_mode_1", "a_mode_2", "read_marked"):
+            views[name][:] = getattr(core, name)
+        views["eliminated"][:] = core.eliminated
+
+        for i, name in enumerate(header_fields[1:], 1):
+            header[i] = values.get(name, 0)
+
+        alive = set(warrior.id for warrior in match.warriors)
+        for i, warrior in enumerate(match.entrants):
+            views["alive"][i] = warrior.id in alive
+            views["territory"][i] = core.color_counts[warrior.id + 1]
+            views["wins"][i] = wins[i]
+
+        header[0] += 1
+
+    def read(self):
+        # Returns a consistent copy of the latest published core, or None if nothing has been published yet
+        header = self.views["header"]
+        while True:
+            sequence = header[0]
+            if sequence == 0: return None
+            if sequence % 2 == 1: continue
+
+            data = bytes(self.memory.buf)
+            if header[0] == sequence:
+                return CoreSnapshot(data, self.layout, self.field_size)
+
+    def close(self, unlink : bool = False):
+        # Views have to be released before the memory can be closed
+        for view in self.views.values():
+            view.release()
+        self.memory.close()
+        if unlink: self.memory.unlink()
+
+class CoreSnapshot:
+    # One consistent copy of a published core
+    def __init__(self, data : bytes, layout : dict, field_size : int):
+        self.data = data
+        self.layout = layout
+        self.size = field_size
+
+        views = get_views(memoryview(data), layout)
+        for name, view in views.items():
+            setattr(self, name, view)
+        for i, name in enumerate(header_fields):
+            setattr(self, name, views["header"][i])
+
+    def get_raw(self, name : str):
+        # The bytes of one of the published arrays, for comparing snapshots quickly
+        offset, typecode, length = self.layout[name]
+        return self.data[offset:offset + array(typecode).itemsize * length], array(typecode).itemsize
+
+    def get_color(self, location : int):
+        # As Core.get_color
+        if self.eliminated[self.owner[location]]: return self.color[location] | CROSS
+        return self.color[location]
+
+    def get_instruction(self, location : int):
+        return Instruction(
+            opcodes[self.opcode[location]],
+            modifiers[self.modifier[location]],
+            addressing_modes[self.a_mode_1[location]],
+            self.address_1[location],
+            addressing_modes[self.a_mode_2[location]],
+            self.address_2[location]
+        )
+
+def get_changed_tiles(old : bytes, new : bytes, itemsize : int, chunk_size : int = 256):
+    # Lists every tile whose value differs between two copies of the same array
+    # Chunks are compared first, so unchanged parts of the core cost next to nothing
+    changed = []
+    step = chunk_size * itemsize
+    for start in range(0, len(new), step):
+        if old[start:start + step] == new[start:start + step]: continue
+
+        for i in range(start, min(start + step, len(new)), itemsize):
+            if old[i:i + itemsize] != new[i:i + itemsize]:
+                changed.append(i // itemsize)
+
+    return changed
+
+class CoreView:
+    # Shows the latest snapshot to the renderer and the detail viewer with the same interface as Core
+    # Highlights are only ever set by the UI, so they are kept here rather than published
+    def __init__(self, field_size : int):
+        self.size = field_size
+        self.snapshot = None
+        # Snapshot the renderer last drew
+        self.drawn = None
+
+        self.highlighted = bytearray(field_size)
+        self.highlights = []
+        self.dirty = set()
+
+    def __len__(self):
+        return self.size
+
+    def update(self, snapshot : CoreSnapshot):
+        self.snapshot = snapshot
+
+    def __getattr__(self, name : str):
+        # Everything else, such as get_color and get_instruction, is read from the current snapshot
+        return getattr(self.snapshot, name)
+
+    def highlight(self, location : int):
+        self.highlighted[location] = 1
+        self.highlights.append(location)
+        self.dirty.add(location)
+
+    def clear_highlights(self):
+        for location in self.highlights:
+            self.highlighted[location] = 0
+            self.dirty.add(location)
+        self.highlights = []
+
+    def mark_all_dirty(self):
+        self.drawn = None
+
+    def take_dirty(self):
+        # Returns every tile which looks different from when the renderer last took them
+        dirty, self.dirty = self.dirty, set()
+        snapshot, drawn = self.snapshot, self.drawn
+        self.drawn = snapshot
+
+        if snapshot is None: return dirty
+        # Eliminations change how every tile of a warrior is shown, so they need a full redraw
+        if drawn is None or drawn.get_raw("eliminated") != snapshot.get_raw("eliminated"):
+            return range(self.size)
+
+        for name in ("color", "read_marked"):
+            dirty.update(get_changed_tiles(drawn.get_raw(name)[0], *snapshot.get_raw(name)))
+        return dirty
@@ -0,0 +1,171 @@
+# This file runs round-robin tournaments between compiled warriors using the headless engine
+# Every pairing is played for a number of rounds, spread across all CPU cores
+
+import os
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import copy
+from random import randrange
+import compiler
+from engine import Match, derive_seed
+from recording import TraceWriter
+
+# Set in each worker process by init_worker, so warriors are only sent to each worker once
+worker_warriors = []
+worker_options = {}
+worker_batch = False
+worker_trace_dir = None
+
+class Standing:
+    def __init__(self, warrior):
+        self.warrior = warrior
+        self.wins = 0
+        self.losses = 0
+        self.ties = 0
+        # Standard scoring: 3 points per win, 1 per tie
+        self.score = 0
+
+    def record(self, outcome : str):
+        match outcome:
+            case "win":
+                self.wins += 1
+                self.score += 3
+            case "loss":
+                self.losses += 1
+            case "tie":
+                self.ties += 1
+                self.score += 1
+
+def init_worker(warriors : list, options : dict, batch : bool, trace_dir : str):
+    global worker_warriors, worker_options, worker_batch, worker_trace_dir
+
+    worker_warriors = warriors
+    worker_options = options
+    worker_batch = batch
+    worker_trace_dir = trace_dir
+
+def run_pairing(first : int, second : int, seed : int, start : int, rounds : int):
+    # Plays a range of rounds between two warriors; returns the winning warrior's index for each round (None for ties)
+    # Within a match the warriors are always given the ids 0 and 1, so any warrior list can be used
+    # Every pairing has its own seed, and every round its own placements, so results do not depend on how rounds are split
+    warriors = [copy(worker_warriors[first]), copy(worker_warriors[second])]
+    warriors[0].id = 0
+    warriors[1].id = 1
+
+    pairing_seed = derive_seed(seed, first, second)
+
+    if worker_batch:
+        # Imported here, so NumPy is only needed when batches are used
+        import batch
+        results = batch.run_rounds(warriors, list(range(start, start + rounds)), **worker_options, seed=pairing_seed)
+        return first, second, [None if result.winner is None else (first, second)[result.winner] for result in results]
+
+    # One match is reused for every round, with its core reset in place
+    match = Match(warriors, **worker_options, seed=pairing_seed, round_index=start)
+
+    winners = []
+    for i in range(start, start + rounds):
+        if i != start: match.reset(i)
+        if worker_trace_dir is not None:
+            # Every round gets its own trace, named after the warriors' indices and the round
+            match.record(TraceWriter(os.path.join(worker_trace_dir, f"{first}-{second}-{i}.trace")))
+        result = match.run()
+        if worker_trace_dir is not None: match.stop_recording()
+        winners.append(None if result.winner is None else (first, second)[result.winner])
+
+    return first, second, winners
+
+def run_tournament(warriors : list, rounds : int = 100, field_size : int = 8000, max_cycles : int = 80000, max_length : int = 100, max_processes : int = 8000, min_distance : int = 0, seed : int = None, workers : int = None, chunk_size : int = 10, progress = None, batch : bool = False, sparse : bool = False, detect_draws : bool = False, trace_dir : str = None):
+    # Runs every pairing of the given warriors for the given amount of rounds, and returns their standings sorted by score
+    # The same seed always produces the same standings; a random one is used if none is given
+    # progress is called with (completed rounds, total rounds) every time a chunk of rounds finishes
+    # With batch set, rounds are run in lockstep on the NumPy batch engine, which gives the same results
+    # With sparse set, cores start out sparse, which saves memory on huge cores; batches are always dense
+    # With detect_draws set, rounds which start repeating themselves end early as draws, which gives the same results; batches are always played out
+    # With trace_dir set, every round is recorded into a trace in that directory, which can be replayed in the GUI; batches are never recorded
+    options = {
+        "field_size": field_size,
+        "max_cycles": max_cycles,
+        "max_length": max_length,
+        "max_processes": max_processes,
+        "min_distance": min_distance
+    }
+    if not batch:
+        options["sparse"] = sparse
+        options["detect_draws"] = detect_draws
+
+    standings = [Standing(warrior) for warrior in warriors]
+    pairings = [(i, k) for i in range(len(warriors)) for k in range(i + 1, len(warriors))]
+    total_rounds = len(pairings) * rounds
+    completed_rounds = 0
+
+    if seed is None: seed = randrange(2 ** 32)
+
+    # One worker per core by default
+    if workers is None: workers = os.cpu_count()
+    # Batches are only faster with many rounds at once, so each pairing is played as a single chunk
+    if batch: chunk_size = rounds
+    if batch: trace_dir = None
+    if trace_dir is not None: os.makedirs(trace_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(warriors, options, batch, trace_dir)) as pool:
+        # Rounds of each pairing are split into chunks, so the work is spread evenly without flooding the queue with tiny jobs
+        futures = []
+        for first, second in pairings:
+            for start in range(0, rounds, chunk_size):
+                futures.append(pool.submit(run_pairing, first, second, seed, start, min(chunk_size, rounds - start)))
+
+        for future in as_completed(futures):
+            first, second, winners = future.result()
+            for winner in winners:
+                if winner is None:
+                    standings[first].record("tie")
+                    standings[second].record("tie")
+                else:
+                    standings[winner].record("win")
+                    standings[second if winner == first else first].record("loss")
+
+            completed_rounds += len(winners)
+            if progress is not None: progress(completed_rounds, total_rounds)
+
+    return sorted(standings, key=lambda standing: standing.score, reverse=True)
+
+def load_warrior(path : str):
+    # Compiles a .red file, in the same way as importing it in the Redcode editor
+    with open(path) as load_file:
+        warrior, error_list = compiler.compile_load_file(load_file.read().split("\n"), False)
+
+    if error_list != []:
+        raise ValueError(f"{path}: " + "; ".join(error_list))
+
+    return warrior
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Run a round-robin tournament between Redcode '94 warriors.")
+    parser.add_argument("warriors", nargs="+", help=".red files to compete")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--core-size", type=int, default=8000)
+    parser.add_argument("--cycles", type=int, default=80000)
+    parser.add_argument("--length", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=8000)
+    parser.add_argument("--distance", type=int, default=0, help="minimum distance between warriors")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch", action="store_true", help="run rounds in lockstep batches (requires NumPy)")
+    parser.add_argument("--sparse", action="store_true", help="start with sparse cores, for very large core sizes")
+    parser.add_argument("--detect-draws", action="store_true", help="end rounds early once they repeat themselves")
+    parser.add_argument("--trace-dir", default=None, help="record every round into a trace in this directory, for replaying in the GUI")
+    args = parser.parse_args()
+
+    compiler.default_constants["CORESIZE"] = str(args.core_size)
+    warriors = [load_warrior(path) for path in args.warriors]
+
+    standings = run_tournament(
+        warriors, args.rounds, args.core_size, args.cycles, args.length, args.processes, args.distance, args.seed, args.workers,
+        progress=lambda done, total: print(f"\rRound {done}/{total}", end="", file=sys.stderr), batch=args.batch, sparse=args.sparse, detect_draws=args.detect_draws, trace_dir=args.trace_dir
+    )
+    print(file=sys.stderr)
+
+    for standing in standings:
+        print(f"{standing.warrior.name:<20} W {standing.wins:<5} L {standing.losses:<5} T {standing.ties:<5} Score {standing.score}")
@@ -0,0 +1,78 @@
+# This file keeps the watchpoints a match can break on: a tile being written, a warrior executing at a tile, and a process count crossing a threshold
+# Watches are only checked on the engine's instrumented path, once every process has run, so a match without any runs exactly as before
+# A hit stops the match at the end of the cycle it happened in, so journals and traces still only ever hold whole cycles
+
+# Flags of the watches set on an address
+WRITE = 1
+EXECUTE = 2
+
+class WatchHit:
+    def __init__(self, kind : str, location : int, warrior_id : int, cycle : int):
+        # One of "write", "execute" or "processes"; for the latter, location is where the process which crossed the threshold executed
+        self.kind = kind
+        self.location = location
+        self.warrior_id = warrior_id
+        # Cycle the hit happened in; the match stops once it is over
+        self.cycle = cycle
+
+class Watches:
+    # Address-indexed table of watchpoints, along with the process count thresholds
+    def __init__(self, field_size : int):
+        self.table = bytearray(field_size)
+        # Warriors an execute watch is limited to, by address; watches on addresses missing from it break on any warrior
+        self.executors = {}
+        # Process count thresholds by warrior id; the one under None applies to every warrior
+        self.thresholds = {}
+        # First hit since it was last taken
+        self.hit = None
+
+    def __bool__(self):
+        # Whether any watch is set
+        return self.table.count(0) != len(self.table) or bool(self.thresholds)
+
+    def watch_writes(self, location : int, on : bool = True):
+        if on: self.table[location] |= WRITE
+        else: self.table[location] &= ~WRITE
+
+    def watch_execution(self, location : int, warrior_id : int = None, on : bool = True):
+        # Watching execution by any warrior overrides watches limited to some
+        if not on or warrior_id is None:
+            self.executors.pop(location, None)
+        elif location in self.executors or not self.table[location] & EXECUTE:
+            self.executors.setdefault(location, set()).add(warrior_id)
+
+        if on: self.table[location] |= EXECUTE
+        else: self.table[location] &= ~EXECUTE
+
+    def watch_processes(self, threshold : int, warrior_id : int = None):
+        # Breaks whenever the warrior's process count reaches the threshold from below, or drops back under it; None removes the threshold
+        if threshold is None: self.thresholds.pop(warrior_id, None)
+        else: self.thresholds[warrior_id] = threshold
+
+    def check(self, cycle : int, warrior_id : int, location : int, before : int, after : int, written : list):
+        # Checks one executed process, given its warrior's process counts before and after it ran, and the tiles it wrote; returns whether any watch was hit
+        table = self.table
+
+        if table[location] & EXECUTE and (location not in self.executors or warrior_id in self.executors[location]):
+            return self.report("execute", location, warrior_id, cycle)
+
+        for tile in written:
+            if table[tile] & WRITE:
+                return self.report("write", tile, warrior_id, cycle)
+
+        if self.thresholds and before != after:
+            for threshold in (self.thresholds.get(warrior_id), self.thresholds.get(None)):
+                if threshold is not None and (before < threshold <= after or after < threshold <= before):
+                    return self.report("processes", location, warrior_id, cycle)
+
+        return False
+
+    def report(self, kind : str, location : int, warrior_id : int, cycle : int):
+        # Only the first hit is kept until it is taken
+        if self.hit is None: self.hit = WatchHit(kind, location, warrior_id, cycle)
+        return True
+
+    def take_hit(self):
+        # Returns the first hit since the last call, if any
+        hit, self.hit = self.hit, None
+        return hit